@@ -1,6 +1,35 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
 
 
+WSGI_SERVERS = ('gunicorn', 'uwsgi', 'daphne', 'uvicorn', 'hypercorn')
+
+
+def serves_requests():
+    """True in a WSGI/ASGI server or runserver's serving process, not in other commands or tests."""
+    if os.path.basename(sys.argv[0]) in WSGI_SERVERS:
+        return True
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
+def load_name_indexes():
+    from django.db import close_old_connections
+    from . import suggest, trigram
+    try:
+        suggest.get_index()
+        trigram.load_at_startup()
+    except Exception as e:
+        # e.g. migrations not applied yet, the indexes load on first use instead
+        print(f"Could not load the product name indexes at startup: {e}")
+    finally:
+        close_old_connections()
+
+
 class EcomConfig(AppConfig):
     name = 'ecom'
     default_auto_field = 'django.db.models.BigAutoField'
@@ -10,8 +39,15 @@ class EcomConfig(AppConfig):
         Initialize the RAG pipeline when the Django app starts.
         This runs only once when the server starts, not on every request.
         """
+        # Model signal handlers (search index sync etc.) are needed in every process
+        from . import signals  # noqa: F401
+
+        if serves_requests():
+            # Load the in-memory name indexes in the background so the first
+            # searches don't pay for it
+            threading.Thread(target=load_name_indexes, daemon=True).start()
+
         # Only initialize in the main process, not in reloader processes
-        import os
         if os.environ.get('RUN_MAIN') != 'true':
             return
 
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core import signing
+
+
+#   Guest cart cookie
+#
+#   Guests keep their cart in the `product_ids` cookie as
+#
+#       v1|<product id>:<quantity>|<product id>:<quantity>...:<signature>
+#
+#   The signature (django.core.signing, salted) stops clients from forging
+#   carts, and the version prefix lets the format change later. The cookie
+#   is decoded once per request by CartCookieMiddleware into `request.cart`
+#   and only written back when a view changed the cart.
+#
+#   Anything else, including the old unsigned `pid:count|pid:count` format,
+#   reads as an empty cart.
+
+COOKIE_NAME = 'product_ids'
+VERSION = 'v1'
+SALT = 'ecom.cart_cookie'
+
+
+def signer():
+    return signing.Signer(salt=SALT)
+
+
+def parse_lines(parts):
+    lines = {}
+    for part in parts:
+        pid, _, count = part.partition(':')
+        try:
+            pid, count = int(pid), int(count)
+        except ValueError:
+            continue
+        if pid > 0 and count > 0:
+            lines[pid] = min(count, settings.CART_COOKIE_MAX_QUANTITY)
+        if len(lines) >= settings.CART_COOKIE_MAX_LINES:
+            break
+    return lines
+
+
+def decode(value):
+    """Lines {product id: quantity} from a cookie value; {} for anything invalid."""
+    if not value or len(value) > settings.CART_COOKIE_MAX_BYTES:
+        return {}
+
+    if not value.startswith(VERSION + '|'):
+        return {}
+    try:
+        payload = signer().unsign(value)
+    except signing.BadSignature:
+        return {}
+    return parse_lines(payload.split('|')[1:])
+
+
+def encode(lines):
+    payload = '|'.join([VERSION] + [f'{pid}:{count}' for pid, count in lines.items()])
+    return signer().sign(payload)
+
+
+class CookieCart:
+    """A guest's cart lines, changed in place and flagged dirty for the middleware."""
+
+    def __init__(self, lines=None):
+        self.lines = lines or {}
+        self.dirty = False
+
+    @property
+    def max_lines(self):
+        return settings.CART_COOKIE_MAX_LINES
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(decode(request.COOKIES.get(COOKIE_NAME)))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __contains__(self, product_id):
+        return product_id in self.lines
+
+    def items(self):
+        return self.lines.items()
+
+    def quantity(self, product_id):
+        return self.lines.get(product_id, 0)
+
+    def add(self, product_id, quantity=1):
+        if product_id not in self.lines and len(self.lines) >= self.max_lines:
+            return False
+        self.lines[product_id] = min(self.lines.get(product_id, 0) + quantity, settings.CART_COOKIE_MAX_QUANTITY)
+        self.dirty = True
+        return True
+
+    def decrement(self, product_id):
+        if product_id not in self.lines:
+            return
+        self.lines[product_id] -= 1
+        if self.lines[product_id] <= 0:
+            del self.lines[product_id]
+        self.dirty = True
+
+    def remove(self, product_id):
+        if self.lines.pop(product_id, None) is not None:
+            self.dirty = True
+
+    def clear(self):
+        if self.lines:
+            self.lines = {}
+            self.dirty = True
+
+    def write(self, response):
+        if not self.dirty:
+            return
+        if self.lines:
+            response.set_cookie(COOKIE_NAME, encode(self.lines), max_age=settings.CART_COOKIE_AGE, samesite='Lax')
+        else:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
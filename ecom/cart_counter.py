@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from . import models
+
+
+#   Cart badge counter
+#
+#   The number of lines in a signed-in customer's cart is kept in the cache
+#   under cart:count:<user id>, so the navbar badge needs no database query.
+#   Cart mutations adjust it with cache.incr / cache.decr, which are atomic on
+#   every shared backend (locmem, Redis, memcached). A missing key is counted
+#   from the Cart table once, and entries expire after CART_COUNT_TIMEOUT so
+#   any drift heals by itself.
+
+
+def cache_key(user_id):
+    return f'cart:count:{user_id}'
+
+
+def get_count(user):
+    key = cache_key(user.id)
+    count = cache.get(key)
+    if count is None:
+        count = models.Cart.objects.filter(customer__user=user).count()
+        # add() so a concurrent adjust() that got there first wins
+        cache.add(key, count, timeout=settings.CART_COUNT_TIMEOUT)
+        count = cache.get(key, count)
+    return count
+
+
+def adjust(user, delta):
+    if not delta:
+        return
+    key = cache_key(user.id)
+    try:
+        if delta > 0:
+            cache.incr(key, delta)
+        else:
+            cache.decr(key, -delta)
+    except ValueError:
+        # Not cached yet: the change is already in the table, count it there
+        get_count(user)
+
+
+def set_count(user, count):
+    cache.set(cache_key(user.id), count, timeout=settings.CART_COUNT_TIMEOUT)
@@ -0,0 +1,74 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+#   Versioned catalog cache
+#
+#   Every cached product-grid page / search result is stored under the current
+#   catalog version. Any change to the catalog bumps the version, which makes
+#   all older entries unreachable at once; they are evicted by the cache
+#   backend instead of expiring on a guessed TTL.
+
+#
+#   The in-memory name indexes (ecom.suggest, ecom.trigram) follow a counter
+#   of their own, bumped only when a product is saved or deleted: image
+#   variants, jobs etc. change the cached pages but not the names.
+
+CATALOG_VERSION_KEY = 'catalog:version'
+NAMES_VERSION_KEY = 'catalog:names_version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a flushed/evicted counter never restarts at a
+        # version whose entries may still be in the cache.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (never set or evicted), start a fresh version
+        get_version(key)
+        return cache.incr(key)
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_names_version():
+    return get_version(NAMES_VERSION_KEY)
+
+
+def bump_names_version():
+    return bump_version(NAMES_VERSION_KEY)
+
+
+def make_key(kind, parts):
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'catalog:{get_catalog_version()}:{kind}:{digest}'
+
+
+def get_or_set(kind, parts, build):
+    """
+    Return the cached value for (kind, parts) under the current catalog
+    version, calling `build()` and caching its result on a miss.
+    """
+    key = make_key(kind, parts)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return value
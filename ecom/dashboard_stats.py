@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from . import models
+
+
+#   Admin dashboard counters
+#
+#   The customer / product / order totals shown on the admin dashboard are
+#   kept in the cache under stats:<name> and moved with cache.incr / decr by
+#   the model signals after commit (and by payment_success_view for its
+#   bulk_create, which sends no signals). The dashboard reads all three with
+#   one get_many; a missing counter is counted from its table once. Entries
+#   expire after DASHBOARD_STATS_TIMEOUT so any drift heals by itself.
+#
+#   Known drift: an adjust() that lands between get_counts()' count() and
+#   add() finds no key and is dropped, so the counter can be off by that
+#   change until it expires.
+
+COUNTED_MODELS = {
+    'customers': models.Customer,
+    'products': models.Product,
+    'orders': models.Orders,
+}
+
+
+def cache_key(name):
+    return f'stats:{name}'
+
+
+def get_counts():
+    """{'customers': n, 'products': n, 'orders': n}"""
+    cached = cache.get_many([cache_key(name) for name in COUNTED_MODELS])
+    counts = {}
+    for name, model in COUNTED_MODELS.items():
+        count = cached.get(cache_key(name))
+        if count is None:
+            count = model.objects.count()
+            # add() so a concurrent adjust() that got there first wins
+            cache.add(cache_key(name), count, timeout=settings.DASHBOARD_STATS_TIMEOUT)
+            count = cache.get(cache_key(name), count)
+        counts[name] = count
+    return counts
+
+
+def adjust(name, delta):
+    if not delta:
+        return
+    try:
+        if delta > 0:
+            cache.incr(cache_key(name), delta)
+        else:
+            cache.decr(cache_key(name), -delta)
+    except ValueError:
+        # Not cached: it is counted from the table on the next dashboard load
+        pass
@@ -0,0 +1,81 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import models
+
+
+#   Streaming CSV / JSONL exports of orders and payment logs
+#
+#   Rows are read with values_list() through iterator(chunk_size=...), so
+#   only one chunk of tuples is in memory at a time (a server-side cursor
+#   on Postgres), and every row is turned into a line as soon as it is
+#   read. The admin export endpoint wraps the generator in a
+#   StreamingHttpResponse and `manage.py export_records` writes it to a file.
+
+def model_fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+EXPORTS = {
+    'orders': (models.Orders, model_fields(models.Orders) + ['customer__user__username', 'product__name', 'product__price']),
+    'payment-logs': (models.PaymentLogs, model_fields(models.PaymentLogs)),
+    'stripe-logs': (models.StripeLogs, model_fields(models.StripeLogs)),
+    'phonepe-logs': (models.PhonepeLogs, model_fields(models.PhonepeLogs)),
+    'gpay-logs': (models.GooglepayLogs, model_fields(models.GooglepayLogs)),
+    'payment-error-logs': (models.PaymentErrorLogs, model_fields(models.PaymentErrorLogs)),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def get_queryset(kind):
+    model, fields = EXPORTS[kind]
+    return model.objects.order_by('pk'), fields
+
+
+def export_rows(queryset, fields):
+    return queryset.values_list(*fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+# Text starting with these is run as a formula by spreadsheet apps
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    # Customer-entered text (address, email, names...) is shown, not evaluated
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+def jsonl_lines(fields, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream(queryset, fields, fmt):
+    """Generator of CSV / JSONL lines for `queryset`."""
+    rows = export_rows(queryset, fields)
+    if fmt == 'jsonl':
+        return jsonl_lines(fields, rows)
+    return csv_lines(fields, rows)
@@ -0,0 +1,88 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+
+
+#   Price facets for the product grid and search results
+#
+#   ?min_price=&max_price=   price range (max is exclusive)
+#   ?sort=price_asc|price_desc
+#
+#   Bucket counts, min and max price are computed over the unfiltered result
+#   set in a single aggregate query; callers cache them with the catalog version.
+
+SORT_ORDERS = {
+    'price_asc': 'price',
+    'price_desc': '-price',
+}
+
+
+def parse_price(value):
+    try:
+        price = int(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price >= 0 else None
+
+
+class PriceFilters:
+
+    def __init__(self, min_price=None, max_price=None, sort=None):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.sort = sort if sort in SORT_ORDERS else None
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(
+            parse_price(request.GET.get('min_price')),
+            parse_price(request.GET.get('max_price')),
+            request.GET.get('sort')
+        )
+
+    @property
+    def price_range(self):
+        if self.min_price is None and self.max_price is None:
+            return None
+        return (self.min_price, self.max_price)
+
+    @property
+    def order_by(self):
+        return SORT_ORDERS.get(self.sort)
+
+    def is_active(self):
+        return self.price_range is not None or self.sort is not None
+
+    def cache_parts(self):
+        return [self.min_price, self.max_price, self.sort]
+
+    def querystring(self, query=None, **overrides):
+        """Query string for links that keep the current search / filters."""
+        params = {'query': query, 'min_price': self.min_price, 'max_price': self.max_price, 'sort': self.sort}
+        params.update(overrides)
+        return urlencode({key: value for key, value in params.items() if value not in (None, '')})
+
+
+def price_facets(queryset):
+    """
+    {'min': .., 'max': .., 'buckets': [{'min', 'max', 'count'}, ...]} for the
+    products in `queryset`, using one aggregate query.
+    """
+    buckets = settings.PRICE_FACET_BUCKETS
+    aggregates = {'min_price': Min('price'), 'max_price': Max('price')}
+    for i, (low, high) in enumerate(buckets):
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f'bucket_{i}'] = Count('id', filter=condition)
+
+    row = queryset.order_by().aggregate(**aggregates)
+    return {
+        'min': row['min_price'],
+        'max': row['max_price'],
+        'buckets': [
+            {'min': low, 'max': high, 'count': row[f'bucket_{i}']}
+            for i, (low, high) in enumerate(buckets)
+        ],
+    }
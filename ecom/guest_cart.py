@@ -0,0 +1,82 @@
+import re
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import cart_cookie
+from .cart_cookie import CookieCart
+
+
+#   Server-side guest carts
+#
+#   With GUEST_CART_STORE = 'cache' the guest's cart lines are kept in the
+#   `guest_carts` cache (Redis in production, locmem locally) under
+#   guest_cart:<cart id>, and the browser only holds the random cart id in the
+#   `guest_cart` cookie. Request headers stay a few bytes whatever the cart
+#   size, so carts can hold up to GUEST_CART_MAX_LINES lines.
+#
+#   Entries expire GUEST_CART_TTL seconds after the last change. Loading a
+#   cart is a single cache get, so merging it into the DB cart at login costs
+#   the same as merging a cookie cart.
+#
+#   A signed `product_ids` cookie left from the cookie store is moved into
+#   the cache the first time the cart changes.
+
+COOKIE_NAME = 'guest_cart'
+CART_ID_RE = re.compile(r'^[A-Za-z0-9_-]{22}$')
+
+
+def get_store():
+    return caches['guest_carts']
+
+
+def cache_key(cart_id):
+    return f'guest_cart:{cart_id}'
+
+
+class CacheCart(CookieCart):
+    """A guest's cart lines stored in the cache, the cookie only carries its id."""
+
+    def __init__(self, cart_id=None, lines=None, legacy_cookie=False):
+        super().__init__(lines)
+        self.cart_id = cart_id
+        self.legacy_cookie = legacy_cookie
+
+    @property
+    def max_lines(self):
+        return settings.GUEST_CART_MAX_LINES
+
+    @classmethod
+    def from_request(cls, request):
+        legacy = cart_cookie.COOKIE_NAME in request.COOKIES
+        cart_id = request.COOKIES.get(COOKIE_NAME)
+        if cart_id and CART_ID_RE.match(cart_id):
+            lines = get_store().get(cache_key(cart_id))
+            if lines is not None:
+                return cls(cart_id, lines, legacy)
+
+        # No (live) server-side cart, start from whatever the old cookie holds
+        return cls(None, cart_cookie.decode(request.COOKIES.get(cart_cookie.COOKIE_NAME)), legacy)
+
+    def write(self, response):
+        if not self.dirty:
+            return
+        if self.lines:
+            if self.cart_id is None:
+                self.cart_id = secrets.token_urlsafe(16)
+            get_store().set(cache_key(self.cart_id), self.lines, timeout=settings.GUEST_CART_TTL)
+            response.set_cookie(COOKIE_NAME, self.cart_id, max_age=settings.GUEST_CART_TTL, samesite='Lax', httponly=True)
+        else:
+            if self.cart_id is not None:
+                get_store().delete(cache_key(self.cart_id))
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+        if self.legacy_cookie:
+            response.delete_cookie(cart_cookie.COOKIE_NAME, samesite='Lax')
+
+
+def from_request(request):
+    """The guest cart for `request` from the configured GUEST_CART_STORE."""
+    if settings.GUEST_CART_STORE == 'cache':
+        return CacheCart.from_request(request)
+    return CookieCart.from_request(request)
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from PIL import Image, ImageOps
+
+from . import catalog_cache, models
+
+
+#   Product image derivatives
+#
+#   Whenever a product gets a new uploaded image, a resized copy is written for
+#   every width in PRODUCT_IMAGE_WIDTHS, once in the original format and once as
+#   WebP, under product_image/derived/. The resulting paths are recorded in
+#   Product.image_variants:
+#
+#       {'source': 'product_image/shoe.png',
+#        'widths': {'300': {'original': 'product_image/derived/shoe_300.png',
+#                           'webp': 'product_image/derived/shoe_300.webp'}, ...}}
+#
+#   Products whose image is an external http(s) URL get the image downloaded
+#   once into product_image/remote/ (named by a hash of the URL), recorded as
+#   'local', and resized from that copy, so browsers never hotlink the remote host.
+#
+#   Downloading and resizing run on a small thread pool after the save has
+#   committed, so the admin's request never waits for it.
+
+DERIVED_DIR = 'product_image/derived'
+REMOTE_DIR = 'product_image/remote'
+
+# Content types accepted from remote hosts, with the extension they are stored under
+REMOTE_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+# Formats Pillow can write back as-is; anything else is re-encoded as JPEG.
+SAVE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMAGE_WORKERS,
+            thread_name_prefix='product-image'
+        )
+    return _executor
+
+
+def is_external(name):
+    return str(name).startswith(('http://', 'https://'))
+
+
+def needs_variants(product):
+    """True if the product has an image that has not been processed yet."""
+    name = str(product.product_image or '')
+    if not name:
+        return False
+    return (product.image_variants or {}).get('source') != name
+
+
+def schedule_variants(product):
+    if settings.PRODUCT_IMAGE_ASYNC:
+        get_executor().submit(_run_in_thread, product.pk)
+    else:
+        generate_variants(product.pk)
+
+
+def _run_in_thread(product_id):
+    # Worker threads get their own DB connection, release it when done
+    try:
+        generate_variants(product_id)
+    except Exception as e:
+        print(f"Failed to generate image variants for product {product_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def resize_to_width(image, width):
+    if image.width <= width:
+        return image.copy()
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, image_format):
+    if image_format in ('JPEG', 'WEBP') and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+
+    buffer = BytesIO()
+    options = {'quality': settings.PRODUCT_IMAGE_QUALITY} if image_format in ('JPEG', 'WEBP') else {}
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def write_file(path, data):
+    # Derived files are keyed by source name + width, overwrite a stale copy
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(data))
+
+
+def fetch_remote(url):
+    """
+    Download an external image into REMOTE_DIR and return its storage path.
+    The file name is derived from the URL, so each URL is only fetched once.
+    """
+    stem = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    for extension in REMOTE_CONTENT_TYPES.values():
+        path = f'{REMOTE_DIR}/{stem}.{extension}'
+        if default_storage.exists(path):
+            return path
+
+    request = urllib.request.Request(url, headers={'User-Agent': 'ecom-image-fetcher'})
+    with urllib.request.urlopen(request, timeout=settings.REMOTE_IMAGE_TIMEOUT) as response:
+        content_type = response.headers.get_content_type()
+        if content_type not in REMOTE_CONTENT_TYPES:
+            raise ValueError(f"unsupported content type {content_type}")
+        # Read one byte past the limit to detect oversized images without trusting Content-Length
+        data = response.read(settings.REMOTE_IMAGE_MAX_BYTES + 1)
+        if len(data) > settings.REMOTE_IMAGE_MAX_BYTES:
+            raise ValueError("image is larger than REMOTE_IMAGE_MAX_BYTES")
+
+    return write_file(f'{REMOTE_DIR}/{stem}.{REMOTE_CONTENT_TYPES[content_type]}', data)
+
+
+def build_variants(source_name, source_file, local_name):
+    """Write every derivative of an opened image file and return the variants dict."""
+    stem = os.path.splitext(os.path.basename(local_name))[0]
+
+    with Image.open(source_file) as image:
+        image_format = image.format if image.format in SAVE_FORMATS else 'JPEG'
+        extension = SAVE_FORMATS[image_format]
+        # Respect camera rotation before throwing the EXIF data away
+        image = ImageOps.exif_transpose(image)
+
+        widths = {}
+        for width in settings.PRODUCT_IMAGE_WIDTHS:
+            resized = resize_to_width(image, width)
+            original_path = write_file(f'{DERIVED_DIR}/{stem}_{width}.{extension}', encode(resized, image_format))
+            webp_path = write_file(f'{DERIVED_DIR}/{stem}_{width}.webp', encode(resized, 'WEBP'))
+            widths[str(width)] = {'original': original_path, 'webp': webp_path}
+
+    return {'source': source_name, 'widths': widths}
+
+
+def generate_variants(product_id):
+    product = models.Product.objects.filter(pk=product_id).first()
+    if product is None or not needs_variants(product):
+        return None
+
+    source_name = product.product_image.name
+    local_name = source_name
+    try:
+        if is_external(source_name):
+            local_name = fetch_remote(source_name)
+        with default_storage.open(local_name, 'rb') as source_file:
+            variants = build_variants(source_name, source_file, local_name)
+    except (OSError, ValueError) as e:
+        # urllib errors are OSErrors; the product keeps using the original URL
+        print(f"Could not process product image {source_name}: {e}")
+        return None
+
+    if local_name != source_name:
+        variants['local'] = local_name
+
+    # update() skips post_save, and only applies if the image was not replaced
+    # while we were resizing it
+    updated = models.Product.objects.filter(pk=product_id, product_image=source_name).update(image_variants=variants)
+    if updated:
+        catalog_cache.bump_catalog_version()
+    return variants
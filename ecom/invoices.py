@@ -0,0 +1,198 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from . import models
+
+
+#   Invoice PDFs
+#
+#   One invoice per checkout (Orders.order_id) covering all of its lines.
+#   The PDF is stored as INVOICE_ROOT/<invoice key>/<digest>.pdf, where the
+#   digest is a SHA-256 of everything printed on it (order, customer, lines,
+#   prices, status) plus TEMPLATE_VERSION. An unchanged order therefore always
+#   maps to the same file and is rendered only once; any change (e.g. a status
+#   update) gives a new digest and a new file, and the invoice's older files
+#   are deleted once it is written. The digest doubles as the ETag.
+#
+#   Rendering runs on a small thread pool, scheduled after the orders are
+#   placed and after every order change, so downloads normally just send the
+#   stored file. INVOICE_ROOT is outside MEDIA_ROOT: invoices hold personal
+#   data and are only served through the download view.
+
+TEMPLATE_NAME = 'ecom/download_invoice.html'
+# Bump when the invoice template changes so every invoice is rendered again
+TEMPLATE_VERSION = 2
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INVOICE_WORKERS,
+            thread_name_prefix='invoice'
+        )
+    return _executor
+
+
+def find_lines(customer_id, order_id, order_pk=None):
+    """The order rows of one invoice, products and customer joined in."""
+    lines = models.Orders.objects.select_related('product', 'customer__user').order_by('id')
+    if not order_id:
+        # Orders placed before order ids existed get an invoice of their own
+        return list(lines.filter(pk=order_pk)) if order_pk else []
+    return list(lines.filter(order_id=order_id, customer_id=customer_id))
+
+
+def invoice_lines(order):
+    """All order rows on the same invoice as `order`."""
+    return find_lines(order.customer_id, order.order_id, order.pk)
+
+
+def get_context(lines):
+    first = lines[0]
+    items = []
+    for line in lines:
+        product = line.product
+        price = product.price if product else 0
+        items.append({
+            'productName': product.name if product else '',
+            'productDescription': product.description if product else '',
+            'productImage': product.product_image if product else None,
+            'productPrice': price,
+            'quantity': line.quantity,
+            'subtotal': price * line.quantity,
+            'status': line.status,
+        })
+    return {
+        'orderId': first.order_id or first.pk,
+        'orderDate': first.order_date,
+        'customerName': first.customer.user if first.customer else '',
+        'customerEmail': first.email,
+        'customerMobile': first.mobile,
+        'shipmentAddress': first.address,
+        # Lines can be at different stages, list each status once
+        'orderStatus': ', '.join(dict.fromkeys(line.status for line in lines if line.status)),
+        'lines': items,
+        'total': sum(item['subtotal'] for item in items),
+    }
+
+
+def get_digest(context):
+    printed = dict(context, lines=[dict(item, productImage=str(item['productImage'] or '')) for item in context['lines']])
+    payload = repr((TEMPLATE_VERSION, sorted(printed.items()))).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def invoice_dir(lines):
+    first = lines[0]
+    # Hashed, order ids are free text
+    key = f'{first.customer_id}:{first.order_id}' if first.order_id else f'order:{first.pk}'
+    return os.path.join(settings.INVOICE_ROOT, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+
+def invoice_path(lines, digest):
+    return os.path.join(invoice_dir(lines), f'{digest}.pdf')
+
+
+def render_pdf(context):
+    html = get_template(TEMPLATE_NAME).render(context)
+    result = io.BytesIO()
+    pdf = pisa.pisaDocument(io.BytesIO(html.encode("ISO-8859-1", "xmlcharrefreplace")), result)
+    if pdf.err:
+        raise ValueError(f"Invoice rendering failed with {pdf.err} errors")
+    return result.getvalue()
+
+
+def write_file(path, content):
+    # Write under a temporary name and rename, so readers never see half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def remove_old_versions(path):
+    """Delete the other PDFs of the invoice stored at `path`."""
+    folder = os.path.dirname(path)
+    for name in os.listdir(folder):
+        old_path = os.path.join(folder, name)
+        if name.endswith('.pdf') and old_path != path:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+
+def ensure_invoice(lines):
+    """(path, digest) of the invoice for `lines`, rendering it if not stored yet."""
+    context = get_context(lines)
+    digest = get_digest(context)
+    path = invoice_path(lines, digest)
+    if not os.path.exists(path):
+        write_file(path, render_pdf(context))
+        remove_old_versions(path)
+    return path, digest
+
+
+def generate(customer_id, order_id, order_pk=None):
+    lines = find_lines(customer_id, order_id, order_pk)
+    if not lines:
+        return None
+    return ensure_invoice(lines)
+
+
+def generate_logged(customer_id, order_id, order_pk=None):
+    # Runs from on_commit callbacks and worker threads: a failed render must
+    # not surface as a failed order, the download view renders it again
+    try:
+        generate(customer_id, order_id, order_pk)
+    except Exception as e:
+        print(f"Failed to generate invoice for order {order_id or order_pk}: {e}")
+
+
+def schedule(order):
+    """Render the invoice containing `order` in the background."""
+    schedule_for(order.customer_id, order.order_id, order.pk)
+
+
+def schedule_for(customer_id, order_id, order_pk=None):
+    """
+    Render the invoice of checkout `order_id` in the background. Takes ids
+    rather than rows so it also works after bulk_create, which doesn't set
+    primary keys on every database (MySQL).
+    """
+    if not settings.INVOICE_ASYNC:
+        generate_logged(customer_id, order_id, order_pk)
+        return
+
+    key = (customer_id, order_id) if order_id else order_pk
+    with _pending_lock:
+        # One render per invoice at a time, the order's other lines share it
+        if key in _pending:
+            return
+        _pending.add(key)
+    get_executor().submit(_run_in_thread, key, customer_id, order_id, order_pk)
+
+
+def _run_in_thread(key, customer_id, order_id, order_pk):
+    with _pending_lock:
+        _pending.discard(key)
+    # Worker threads get their own DB connection, release it when done
+    try:
+        generate_logged(customer_id, order_id, order_pk)
+    finally:
+        close_old_connections()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from ecom import exports
+
+
+class Command(BaseCommand):
+    help = 'Streams orders or payment logs to a CSV / JSONL file (or stdout) in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write, stdout when omitted')
+
+    def handle(self, *args, **options):
+        queryset, fields = exports.get_queryset(options['kind'])
+        lines = exports.stream(queryset, fields, options['format'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = -1 if options['format'] == 'csv' else 0  # don't count the CSV header
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} {options['kind']} rows to {options['output']}"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from ecom import images, models
+
+
+class Command(BaseCommand):
+    help = 'Downloads external product images and generates resized / WebP copies for images that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate copies for every product image')
+
+    def handle(self, *args, **options):
+        products = models.Product.objects.exclude(product_image='').exclude(product_image__isnull=True)
+        if options['force']:
+            products.update(image_variants={})
+
+        done = 0
+        for product in products.iterator():
+            if images.needs_variants(product) and images.generate_variants(product.pk):
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f"Generated image copies for {done} products."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from ecom import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text product search index from the Product table.'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rebuilding product search index...")
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Product search index rebuilt."))
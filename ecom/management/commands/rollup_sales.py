@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from ecom import sales_rollup
+from ecom.order_board import parse_date
+
+
+class Command(BaseCommand):
+    help = 'Rolls up orders placed since the last run into the daily sales tables. Safe to rerun.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Also re-aggregate every day from this date (YYYY-MM-DD), e.g. after status changes')
+        parser.add_argument('--rebuild', action='store_true', help='Drop all rollups and aggregate every order again')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+        days = sales_rollup.run(since=since, rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f"Aggregated sales for {days} days."))
@@ -0,0 +1,44 @@
+from django.utils.cache import cc_delim_re
+
+from . import guest_cart
+
+
+class CartCookieMiddleware:
+    """
+    Loads the guest cart once into `request.cart` (from the cookie or the
+    server-side store, see GUEST_CART_STORE) and writes it back only if a view
+    changed the cart, so untouched responses carry no Set-Cookie and stay
+    cacheable.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart = guest_cart.from_request(request)
+        response = self.get_response(request)
+        request.cart.write(response)
+        return response
+
+
+class SharedCacheMiddleware:
+    """
+    Drops `Cookie` from Vary on responses marked `shared_cache` (the anonymous
+    storefront pages, see render_storefront_page). SessionMiddleware adds it
+    as soon as request.user is looked at, and every guest has different
+    csrftoken / cart cookies, so proxies would keep one copy per visitor.
+    Listed above SessionMiddleware so it sees the final headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(response, 'shared_cache', False) and response.has_header('Vary'):
+            vary = [field for field in cc_delim_re.split(response['Vary']) if field and field.lower() != 'cookie']
+            if vary:
+                response['Vary'] = ', '.join(vary)
+            else:
+                del response['Vary']
+        return response
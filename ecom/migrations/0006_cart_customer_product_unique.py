@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_lines(apps, schema_editor):
+    # Older code could create two lines for the same product, fold them into one
+    Cart = apps.get_model('ecom', 'Cart')
+    duplicates = (
+        Cart.objects.values('customer_id', 'product_id')
+        .annotate(lines=Count('id'), keep_id=Min('id'), quantity=Sum('quantity'), total_price=Sum('total_price'))
+        .filter(lines__gt=1)
+    )
+    for row in duplicates:
+        lines = Cart.objects.filter(customer_id=row['customer_id'], product_id=row['product_id'])
+        lines.exclude(id=row['keep_id']).delete()
+        lines.update(quantity=row['quantity'], total_price=row['total_price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom', '0005_product_price_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('customer', 'product'), name='ecom_cart_customer_product_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom', '0006_cart_customer_product_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['customer', 'id'], name='ecom_orders_customer_id_idx'),
+        ),
+    ]
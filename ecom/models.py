@@ -24,6 +24,14 @@ class Product(models.Model):
     product_image= models.ImageField(upload_to='product_image/',null=True,blank=True , max_length=250)
     price = models.PositiveIntegerField()
     description=models.CharField(max_length=250)
+    # Resized / WebP copies of product_image, filled in by ecom.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Price filters / price sort with keyset pagination on (price, id)
+            models.Index(fields=['price', 'id'], name='ecom_product_price_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -33,22 +41,48 @@ class Product(models.Model):
         """
         Returns the appropriate image URL for both local files and external URLs
         """
-        if not self.product_image:
-            return None
+        return Product.image_url_from_values(str(self.product_image or ''), self.image_variants)
+
+    def get_image_url_for(self, width, webp=False):
+        """
+        Returns the URL of the resized copy that is at least `width` pixels wide,
+        falling back to the full image until the copies have been generated
+        """
+        return Product.image_variant_url_from_values(str(self.product_image or ''), self.image_variants, width, webp)
+
+    # The two helpers below work on raw column values, so code reading rows
+    # with .values() (e.g. the catalog API) can build the same URLs.
 
-        # Convert to string to handle both file paths and URLs
-        image_str = str(self.product_image)
+    @staticmethod
+    def image_url_from_values(image_str, variants):
+        if not image_str:
+            return None
+        storage = Product._meta.get_field('product_image').storage
 
         # Check if it's an external URL (starts with http:// or https://)
         if image_str.startswith(('http://', 'https://')):
+            # Serve the downloaded copy once ecom.images has fetched it
+            variants = variants or {}
+            if variants.get('source') == image_str and variants.get('local'):
+                return storage.url(variants['local'])
             return image_str
         else:
             # It's a local file, return the media URL
-            try:
-                return self.product_image.url
-            except ValueError:
-                # Handle case where file doesn't exist
-                return None
+            return storage.url(image_str)
+
+    @staticmethod
+    def image_variant_url_from_values(image_str, variants, width, webp=False):
+        variants = variants or {}
+        if not image_str or variants.get('source') != image_str:
+            return None if webp else Product.image_url_from_values(image_str, variants)
+
+        widths = sorted(int(w) for w in variants.get('widths', {}))
+        if not widths:
+            return None if webp else Product.image_url_from_values(image_str, variants)
+
+        fits = [w for w in widths if w >= width]
+        variant = variants['widths'][str(fits[0] if fits else widths[-1])]
+        return Product._meta.get_field('product_image').storage.url(variant['webp' if webp else 'original'])
     
 class Cart(models.Model):
     customer = models.ForeignKey('Customer' , on_delete=models.CASCADE)
@@ -56,6 +90,12 @@ class Cart(models.Model):
     quantity = models.IntegerField()
     total_price = models.DecimalField(max_digits=10 , decimal_places=2)
 
+    class Meta:
+        constraints = [
+            # One line per product, quantity changes are done in place (F() updates)
+            models.UniqueConstraint(fields=['customer', 'product'], name='ecom_cart_customer_product_uniq'),
+        ]
+
 class Orders(models.Model):
     STATUS =(
         ('Pending','Pending'),
@@ -74,6 +114,53 @@ class Orders(models.Model):
     transaction_id = models.CharField(max_length=250)
     quantity = models.IntegerField(default=1)
 
+    class Meta:
+        indexes = [
+            # A customer's orders newest first, keyset paginated on the id (my_order_view)
+            models.Index(fields=['customer', 'id'], name='ecom_orders_customer_id_idx'),
+            # Admin order board filtered by status, newest first
+            models.Index(fields=['status', 'id'], name='ecom_orders_status_id_idx'),
+        ]
+
+
+# Daily sales rollups, filled incrementally by `manage.py rollup_sales`
+# (ecom/sales_rollup.py) and read by the admin sales page
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)  # distinct order_id (one checkout)
+    units = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey('Product', on_delete=models.CASCADE)
+    units = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='ecom_dailyproductsales_date_product_uniq'),
+        ]
+
+
+class DailyStatusCount(models.Model):
+    date = models.DateField()
+    status = models.CharField(max_length=50)
+    orders = models.IntegerField(default=0)  # Orders rows (lines) in that status
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='ecom_dailystatuscount_date_status_uniq'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
 
     
     
@@ -0,0 +1,56 @@
+from datetime import date
+from urllib.parse import urlencode
+
+from . import models
+
+
+#   Filters for the admin order board
+#
+#   ?status=<Orders.STATUS value>
+#   ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD   order_date range, both inclusive
+#
+#   The board pages newest first on the id; with a status filter the
+#   (status, id) index on Orders serves the whole page.
+
+STATUSES = [value for value, label in models.Orders.STATUS]
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class OrderFilters:
+
+    def __init__(self, status=None, date_from=None, date_to=None):
+        self.status = status if status in STATUSES else None
+        self.date_from = date_from
+        self.date_to = date_to
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(
+            request.GET.get('status'),
+            parse_date(request.GET.get('date_from')),
+            parse_date(request.GET.get('date_to'))
+        )
+
+    def apply(self, queryset):
+        if self.status is not None:
+            queryset = queryset.filter(status=self.status)
+        if self.date_from is not None:
+            queryset = queryset.filter(order_date__gte=self.date_from)
+        if self.date_to is not None:
+            queryset = queryset.filter(order_date__lte=self.date_to)
+        return queryset
+
+    def is_active(self):
+        return any(value is not None for value in (self.status, self.date_from, self.date_to))
+
+    def querystring(self, **overrides):
+        """Query string for page links that keep the current filters."""
+        params = {'status': self.status, 'date_from': self.date_from, 'date_to': self.date_to}
+        params.update(overrides)
+        return urlencode({key: value for key, value in params.items() if value not in (None, '')})
@@ -0,0 +1,194 @@
+from django.db import connection
+from django.db.models import Max, Q
+
+
+#   Keyset (cursor) pagination
+#
+#   Pages are addressed by the id of the last item on the previous page
+#   (?after=<id>) or the first item on the next page (?before=<id>) instead of
+#   a page number, so the database never has to skip over OFFSET rows and no
+#   COUNT(*) is needed to render a page.
+#
+#   Pages can also be ordered by another column (e.g. price) with the id as
+#   tie-breaker. The cursor is still a product id; its sort value is looked up
+#   to continue from the right (value, id) position, which a composite index
+#   on (column, id) serves directly. order_by='-pk' pages newest first on the
+#   primary key alone.
+
+
+def parse_cursor(value):
+    """Return the cursor id from a query param, or None for a missing/garbage value."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count for an unfiltered queryset, read from the database
+    statistics instead of a COUNT(*) scan. Filtered querysets are counted exactly.
+    """
+    if queryset.query.where:
+        return queryset.count()
+
+    table = queryset.model._meta.db_table
+    estimate = None
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table]
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+
+    if estimate is None or estimate < 0:
+        # SQLite keeps no row statistics; the highest id is an index lookup and
+        # an upper bound for the row count.
+        estimate = queryset.aggregate(max_id=Max('pk'))['max_id'] or 0
+    return estimate
+
+
+class KeysetPage:
+    """
+    One page of results. It holds no reference to the queryset it came from,
+    so it can be pickled into the cache as-is.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, estimated_total=None):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.estimated_total = estimated_total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        return self.object_list[-1].pk if self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return self.object_list[0].pk if self.object_list else None
+
+
+class KeysetPaginator:
+    """
+    Cursor paginator over the primary key.
+
+    `object_list` is either a queryset (paged in id order, newest first with
+    order_by='-pk', or by `order_by` such as 'price' / '-price' with the id as
+    tie-breaker) or an object with a
+    `keyset_page(after, before, limit)` method, such as ranked search results,
+    which applies the cursor itself.
+    """
+
+    def __init__(self, object_list, per_page, estimate_total=False, order_by=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.estimate_total = estimate_total
+        self.order_by = order_by
+        self._estimated_total = None
+
+    def fetch(self, after, before, limit):
+        if hasattr(self.object_list, 'keyset_page'):
+            return self.object_list.keyset_page(after=after, before=before, limit=limit)
+        if self.order_by == '-pk':
+            return self.fetch_descending(after, before, limit)
+        if self.order_by:
+            return self.fetch_ordered(after, before, limit)
+
+        queryset = self.object_list
+        if before is not None:
+            items = list(queryset.filter(pk__lt=before).order_by('-pk')[:limit])
+            items.reverse()
+            return items
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        return list(queryset.order_by('pk')[:limit])
+
+    def fetch_descending(self, after, before, limit):
+        queryset = self.object_list
+        if before is not None:
+            items = list(queryset.filter(pk__gt=before).order_by('pk')[:limit])
+            items.reverse()
+            return items
+        if after is not None:
+            queryset = queryset.filter(pk__lt=after)
+        return list(queryset.order_by('-pk')[:limit])
+
+    def fetch_ordered(self, after, before, limit):
+        field = self.order_by.lstrip('-')
+        descending = self.order_by.startswith('-')
+        queryset = self.object_list
+        cursor_id = after if after is not None else before
+
+        if cursor_id is not None:
+            # The cursor row may have been filtered out since, read its value from the table
+            value = queryset.model._default_manager.filter(pk=cursor_id).values_list(field, flat=True).first()
+            if value is None:
+                after = before = None
+            else:
+                # Walking towards larger values: forward on an ascending sort, back on a descending one
+                op = 'gt' if (after is not None) != descending else 'lt'
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': cursor_id})
+                )
+
+        backwards = before is not None and after is None
+        prefix = '-' if backwards != descending else ''
+        items = list(queryset.order_by(f'{prefix}{field}', f'{prefix}pk')[:limit])
+        if backwards:
+            items.reverse()
+        return items
+
+    def get_page(self, after=None, before=None):
+        after = parse_cursor(after)
+        before = parse_cursor(before)
+
+        # One extra row tells us whether there is another page in that direction
+        items = self.fetch(after, before if after is None else None, self.per_page + 1)
+
+        if before is not None and after is None:
+            has_previous = len(items) > self.per_page
+            items = items[-self.per_page:] if has_previous else items
+            has_next = True
+        else:
+            has_next = len(items) > self.per_page
+            items = items[:self.per_page]
+            has_previous = after is not None
+
+        return KeysetPage(items, has_next, has_previous, self.estimated_total())
+
+    def estimated_total(self):
+        if not self.estimate_total:
+            return None
+        if self._estimated_total is None:
+            if hasattr(self.object_list, 'keyset_page'):
+                self._estimated_total = self.object_list.count()
+            else:
+                self._estimated_total = estimate_count(self.object_list)
+        return self._estimated_total
@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import models
+
+
+#   Daily sales rollups
+#
+#   DailySales          one row per day: checkouts, units, revenue
+#   DailyProductSales   one row per (day, product): units, revenue
+#   DailyStatusCount    one row per (day, status): order lines
+#
+#   run() picks up the orders added since the watermark (the highest order
+#   id already rolled up) and re-aggregates every day they fall on from the
+#   Orders table. Days are always rebuilt whole, so running it twice, or
+#   after a crash, gives the same rows. The day of the previous watermark
+#   is re-aggregated too, which catches orders that committed late with a
+#   lower id.
+#
+#   Revenue is quantity x the product's current price, Orders don't record
+#   the price paid. Status counts are as of the last aggregation of that
+#   day; --since re-aggregates older days after status changes.
+
+WATERMARK = 'daily_sales'
+DAYS_PER_BATCH = 200
+
+
+def revenue():
+    return Coalesce(Sum(F('quantity') * F('product__price')), 0)
+
+
+def aggregate_days(days):
+    """Replace the rollup rows of `days` with fresh aggregates from Orders."""
+    orders = models.Orders.objects.filter(order_date__in=days)
+
+    daily = orders.values('order_date').annotate(
+        checkouts=Count('order_id', distinct=True), units=Coalesce(Sum('quantity'), 0), total=revenue()
+    ).order_by()
+    per_product = orders.filter(product__isnull=False).values('order_date', 'product_id').annotate(
+        units=Coalesce(Sum('quantity'), 0), total=revenue()
+    ).order_by()
+    per_status = orders.filter(status__isnull=False).values('order_date', 'status').annotate(
+        lines=Count('id')
+    ).order_by()
+
+    models.DailySales.objects.filter(date__in=days).delete()
+    models.DailyProductSales.objects.filter(date__in=days).delete()
+    models.DailyStatusCount.objects.filter(date__in=days).delete()
+
+    models.DailySales.objects.bulk_create([
+        models.DailySales(date=row['order_date'], orders=row['checkouts'], units=row['units'], revenue=row['total'])
+        for row in daily
+    ])
+    models.DailyProductSales.objects.bulk_create([
+        models.DailyProductSales(date=row['order_date'], product_id=row['product_id'], units=row['units'], revenue=row['total'])
+        for row in per_product
+    ])
+    models.DailyStatusCount.objects.bulk_create([
+        models.DailyStatusCount(date=row['order_date'], status=row['status'], orders=row['lines'])
+        for row in per_status
+    ])
+
+
+def order_days(queryset):
+    return set(queryset.exclude(order_date__isnull=True).values_list('order_date', flat=True).distinct())
+
+
+def run(since=None, rebuild=False):
+    """
+    Roll up the orders placed since the last run. `since` (a date) also
+    re-aggregates every day from then on, `rebuild` starts over from scratch.
+    Returns the number of days aggregated.
+    """
+    with transaction.atomic():
+        # The lock keeps two runs from interleaving
+        watermark, _ = models.RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        if rebuild:
+            models.DailySales.objects.all().delete()
+            models.DailyProductSales.objects.all().delete()
+            models.DailyStatusCount.objects.all().delete()
+            watermark.last_order_id = 0
+
+        new_orders = models.Orders.objects.filter(id__gt=watermark.last_order_id)
+        last_id = new_orders.aggregate(last_id=Max('id'))['last_id']
+
+        days = set()
+        if last_id is not None:
+            days |= order_days(new_orders.filter(id__lte=last_id))
+        if watermark.last_order_id:
+            days |= order_days(models.Orders.objects.filter(id=watermark.last_order_id))
+        if since is not None:
+            # Days that no longer have any orders lose their rows too
+            for model in (models.DailySales, models.DailyProductSales, models.DailyStatusCount):
+                model.objects.filter(date__gte=since).delete()
+            days |= order_days(models.Orders.objects.filter(order_date__gte=since))
+
+        days = sorted(days)
+        for i in range(0, len(days), DAYS_PER_BATCH):
+            aggregate_days(days[i:i + DAYS_PER_BATCH])
+
+        if last_id is not None:
+            watermark.last_order_id = last_id
+        watermark.save()
+    return len(days)
+
+
+def sales_report(date_from, date_to):
+    """Rollup rows for the admin sales page, date_from..date_to inclusive."""
+    days = list(models.DailySales.objects.filter(date__range=(date_from, date_to)).order_by('date'))
+    peak = max((day.revenue for day in days), default=0)
+    for day in days:
+        # Bar width for the revenue chart
+        day.percent = round(day.revenue * 100 / peak) if peak else 0
+
+    top_products = (
+        models.DailyProductSales.objects.filter(date__range=(date_from, date_to))
+        .values('product_id', 'product__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'product_id')[:10]
+    )
+    statuses = (
+        models.DailyStatusCount.objects.filter(date__range=(date_from, date_to))
+        .values('status')
+        .annotate(orders=Sum('orders'))
+        .order_by('status')
+    )
+    return {
+        'days': days,
+        'total_orders': sum(day.orders for day in days),
+        'total_units': sum(day.units for day in days),
+        'total_revenue': sum(day.revenue for day in days),
+        'top_products': list(top_products),
+        'statuses': list(statuses),
+    }
+
+
+def default_range():
+    today = timezone.localdate()
+    return today - timedelta(days=29), today
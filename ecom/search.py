@@ -0,0 +1,378 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from . import models, trigram
+
+
+#   Full-text product search
+#
+#   SQLite  -> FTS5 virtual table `ecom_product_fts` (rowid == product id)
+#   Postgres -> GIN index over a weighted tsvector of name + description
+#   Others   -> plain icontains over name and description
+#
+#   The index tables / indexes are created in migration 0002_product_search_index.
+#
+#   When the full-text search finds fewer than SEARCH_FUZZY_MIN_HITS products,
+#   the results are topped up with names that are similar to the query
+#   (ecom.trigram), so misspelled searches still find something.
+
+FTS_TABLE = 'ecom_product_fts'
+
+# Name matches count for much more than description matches when ranking.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Must stay identical to the expression the GIN index is built on, otherwise
+# Postgres will not use the index.
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+
+def tokenize(query):
+    """Split a raw search string into lowercase word tokens."""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def price_filter(price_range):
+    """Q for a (min_price, max_price) pair, either bound may be None (max is exclusive)."""
+    min_price, max_price = price_range or (None, None)
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(price__lt=max_price)
+    return condition
+
+
+class FullTextBackend:
+    """
+    Shared ranking / paging for the full-text backends. Subclasses provide
+    `ranked_sql(terms)` returning rows of (id, score) where a lower score is
+    a better match, and `count_all(terms)`.
+    """
+
+    def filtered_sql(self, terms, price_range=None):
+        """ranked_sql() restricted to a price range."""
+        ranked, params = self.ranked_sql(terms)
+        min_price, max_price = price_range or (None, None)
+        if min_price is None and max_price is None:
+            return ranked, params
+
+        conditions = []
+        if min_price is not None:
+            conditions.append("p.price >= %s")
+            params = params + [min_price]
+        if max_price is not None:
+            conditions.append("p.price < %s")
+            params = params + [max_price]
+        return (
+            f"SELECT r.id AS id, r.score AS score FROM ({ranked}) r "
+            f"JOIN ecom_product p ON p.id = r.id WHERE {' AND '.join(conditions)}",
+            params
+        )
+
+    def matching_ids(self, terms):
+        """Subquery of all matching product ids, for use in id__in filters."""
+        ranked, params = self.ranked_sql(terms)
+        return RawSQL(f"SELECT id FROM ({ranked}) matched", params)
+
+    def count(self, terms, price_range=None):
+        if price_range and price_range != (None, None):
+            ranked, params = self.filtered_sql(terms, price_range)
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM ({ranked}) filtered", params)
+                return cursor.fetchone()[0]
+        return self.count_all(terms)
+
+    def ranked_ids(self, terms, offset, limit, price_range=None):
+        ranked, params = self.filtered_sql(terms, price_range)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM ({ranked}) ranked ORDER BY score, id LIMIT %s OFFSET %s",
+                params + [limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def keyset_ids(self, terms, after=None, before=None, limit=9, price_range=None):
+        ranked, params = self.filtered_sql(terms, price_range)
+        cursor_id = after if after is not None else before
+        where = ''
+        where_params = []
+
+        with connection.cursor() as cursor:
+            if cursor_id is not None:
+                cursor.execute(f"SELECT score FROM ({ranked}) ranked WHERE id = %s", params + [cursor_id])
+                row = cursor.fetchone()
+                if row is None:
+                    # The cursor product no longer matches, start over
+                    after = before = None
+                else:
+                    op = '>' if after is not None else '<'
+                    where = f"WHERE score {op} %s OR (score = %s AND id {op} %s)"
+                    where_params = [row[0], row[0], cursor_id]
+
+            order = 'score DESC, id DESC' if before is not None and after is None else 'score, id'
+            cursor.execute(
+                f"SELECT id FROM ({ranked}) ranked {where} ORDER BY {order} LIMIT %s",
+                params + where_params + [limit]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+        if before is not None and after is None:
+            ids.reverse()
+        return ids
+
+
+class SQLiteFTSBackend(FullTextBackend):
+
+    def match_expression(self, terms):
+        # Every term is quoted so user input can never be parsed as FTS5 syntax,
+        # and prefix matched so partially typed words still hit.
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def ranked_sql(self, terms):
+        return (
+            f"SELECT rowid AS id, bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [self.match_expression(terms)]
+        )
+
+    def count_all(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [self.match_expression(terms)]
+            )
+            return cursor.fetchone()[0]
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (%s, %s, %s)",
+                [product.pk, product.name, product.description]
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, description) "
+                f"SELECT id, name, description FROM ecom_product"
+            )
+
+
+class PostgresFTSBackend(FullTextBackend):
+
+    def tsquery(self, terms):
+        # Prefix match every term, AND them together.
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def ranked_sql(self, terms):
+        # ts_rank is "higher is better", negate it so both backends sort ascending.
+        # float8 keeps the score exact when it round-trips through a cursor.
+        tsquery = self.tsquery(terms)
+        return (
+            f"SELECT id, -ts_rank(({PG_SEARCH_VECTOR}), to_tsquery('english', %s))::float8 AS score "
+            f"FROM ecom_product WHERE ({PG_SEARCH_VECTOR}) @@ to_tsquery('english', %s)",
+            [tsquery, tsquery]
+        )
+
+    def count_all(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM ecom_product "
+                f"WHERE ({PG_SEARCH_VECTOR}) @@ to_tsquery('english', %s)",
+                [self.tsquery(terms)]
+            )
+            return cursor.fetchone()[0]
+
+    # The GIN index is maintained by Postgres itself.
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX ecom_product_search_idx")
+
+
+class LikeBackend:
+    """Fallback for databases without a full-text index (e.g. MySQL)."""
+
+    def queryset(self, terms, price_range=None):
+        products = models.Product.objects.filter(price_filter(price_range))
+        for term in terms:
+            products = products.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return products.order_by('id')
+
+    def matching_ids(self, terms):
+        return self.queryset(terms).values('id')
+
+    def count(self, terms, price_range=None):
+        return self.queryset(terms, price_range).count()
+
+    def ranked_ids(self, terms, offset, limit, price_range=None):
+        return list(self.queryset(terms, price_range).values_list('id', flat=True)[offset:offset + limit])
+
+    def keyset_ids(self, terms, after=None, before=None, limit=9, price_range=None):
+        products = self.queryset(terms, price_range)
+        if after is not None:
+            return list(products.filter(id__gt=after).values_list('id', flat=True)[:limit])
+        if before is not None:
+            ids = list(products.filter(id__lt=before).order_by('-id').values_list('id', flat=True)[:limit])
+            ids.reverse()
+            return ids
+        return list(products.values_list('id', flat=True)[:limit])
+
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+_backend = None
+
+def get_backend():
+    global _backend
+
+    if _backend is None:
+        if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend = SQLiteFTSBackend()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresFTSBackend()
+        else:
+            _backend = LikeBackend()
+    return _backend
+
+
+class ProductSearchResults:
+    """
+    Ranked search results that can be handed to Django's Paginator (offset
+    slicing) or to KeysetPaginator (cursor paging via `keyset_page`).
+    Only the ids for the requested page are read from the index, then the
+    products for that page are loaded in one query.
+    """
+
+    # Set on results that are (also) similar names, not full-text hits
+    approximate = False
+    topped_up = False
+
+    def __init__(self, query, price_range=None):
+        self.query = query
+        self.terms = tokenize(query)
+        self.price_range = price_range
+        self.backend = get_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.price_range) if self.terms else 0
+        return self._count
+
+    def queryset(self):
+        """All matching products as a queryset, for facet counts and price sorting."""
+        if not self.terms:
+            return models.Product.objects.none()
+        return models.Product.objects.filter(price_filter(self.price_range), id__in=self.backend.matching_ids(self.terms))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = key.start or 0
+            stop = key.stop if key.stop is not None else self.count()
+            if not self.terms or stop <= start:
+                return []
+            ids = self.backend.ranked_ids(self.terms, start, stop - start, self.price_range)
+            products = models.Product.objects.in_bulk(ids)
+            return [products[pk] for pk in ids if pk in products]
+
+        results = self[key:key + 1]
+        if not results:
+            raise IndexError(key)
+        return results[0]
+
+    def keyset_page(self, after=None, before=None, limit=9):
+        if not self.terms:
+            return []
+        ids = self.backend.keyset_ids(self.terms, after=after, before=before, limit=limit, price_range=self.price_range)
+        products = models.Product.objects.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+
+class RankedIdResults:
+    """
+    A short, already ranked list of product ids (the fuzzy fallback), paged
+    with the same `keyset_page` interface as ProductSearchResults. The first
+    `exact_count` ids are full-text hits, the rest are similar names.
+    """
+
+    def __init__(self, ids, exact_count=0):
+        self.ids = ids
+        self.approximate = exact_count == 0
+        self.topped_up = len(ids) > exact_count
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return self.count()
+
+    def queryset(self):
+        return models.Product.objects.filter(id__in=self.ids)
+
+    def keyset_page(self, after=None, before=None, limit=9):
+        if after in self.ids:
+            ids = self.ids[self.ids.index(after) + 1:][:limit]
+        elif before in self.ids:
+            end = self.ids.index(before)
+            ids = self.ids[max(end - limit, 0):end]
+        else:
+            ids = self.ids[:limit]
+        products = models.Product.objects.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+
+def search_products(query, price_range=None):
+    results = ProductSearchResults(query, price_range)
+    if not results.terms or results.count() >= settings.SEARCH_FUZZY_MIN_HITS:
+        return results
+
+    # Too few exact hits: keep them first, then the closest names
+    exact_ids = results.backend.ranked_ids(results.terms, 0, results.count(), price_range)
+    similar_ids = trigram.similar_product_ids(' '.join(results.terms), settings.SEARCH_FUZZY_LIMIT)
+    similar_ids = [pk for pk in similar_ids if pk not in exact_ids]
+    if similar_ids and price_range:
+        in_range = set(models.Product.objects.filter(price_filter(price_range), id__in=similar_ids).values_list('id', flat=True))
+        similar_ids = [pk for pk in similar_ids if pk in in_range]
+    return RankedIdResults(exact_ids + similar_ids, len(exact_ids))
+
+
+def index_product(product):
+    get_backend().index_product(product)
+
+
+def remove_product(product_id):
+    get_backend().remove_product(product_id)
+
+
+def rebuild_index():
+    get_backend().rebuild()
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import catalog_cache, dashboard_stats, images, invoices, models, search, suggest, trigram
+
+
+@receiver(post_save, sender=models.Product)
+def product_saved(sender, instance, created=False, raw=False, **kwargs):
+    # Skip fixture loading, the index is rebuilt separately in that case
+    if raw:
+        return
+    if created:
+        transaction.on_commit(lambda: dashboard_stats.adjust('products', 1))
+    search.index_product(instance)
+
+    # Bump after commit, else a concurrent request could cache the old
+    # catalog under the new version
+    def catalog_changed():
+        catalog_cache.bump_catalog_version()
+        version = catalog_cache.bump_names_version()
+        suggest.index_product(instance, version)
+        trigram.index_product(instance, version)
+    transaction.on_commit(catalog_changed)
+
+    # Resize after commit so the worker thread sees the saved image path
+    if images.needs_variants(instance):
+        transaction.on_commit(lambda: images.schedule_variants(instance))
+
+
+@receiver(post_delete, sender=models.Product)
+def product_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: dashboard_stats.adjust('products', -1))
+    search.remove_product(instance.pk)
+    product_id = instance.pk
+
+    def catalog_changed():
+        catalog_cache.bump_catalog_version()
+        version = catalog_cache.bump_names_version()
+        suggest.remove_product(product_id, version)
+        trigram.remove_product(product_id, version)
+    transaction.on_commit(catalog_changed)
+
+
+@receiver([post_save, post_delete], sender=models.CreateJob)
+def job_changed(sender, **kwargs):
+    # The storefront navbar lists open jobs, so cached pages must be re-rendered
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+
+# Dashboard counters for customers and orders, see ecom.dashboard_stats.
+# Moved after commit so a rolled back create / delete leaves them alone.
+
+@receiver(post_save, sender=models.Customer)
+@receiver(post_save, sender=models.Orders)
+def counted_model_saved(sender, created=False, raw=False, **kwargs):
+    if created and not raw:
+        name = 'customers' if sender is models.Customer else 'orders'
+        transaction.on_commit(lambda: dashboard_stats.adjust(name, 1))
+
+
+@receiver(post_save, sender=models.Orders)
+def order_changed(sender, instance, created=False, raw=False, **kwargs):
+    # A status / address change alters the invoice, render the new one after commit
+    if not created and not raw:
+        transaction.on_commit(lambda: invoices.schedule(instance))
+
+
+@receiver(post_delete, sender=models.Customer)
+@receiver(post_delete, sender=models.Orders)
+def counted_model_deleted(sender, **kwargs):
+    name = 'customers' if sender is models.Customer else 'orders'
+    transaction.on_commit(lambda: dashboard_stats.adjust(name, -1))
@@ -0,0 +1,131 @@
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+from . import catalog_cache, models
+
+
+#   Search-box autocomplete
+#
+#   An in-process prefix index over product names: a sorted list of
+#   (normalized key, product id) pairs searched with bisect. Every word of a
+#   name starts a key ("red running shoe" -> "red running shoe",
+#   "running shoe", "shoe"), so typing any word of a name finds it.
+#
+#   The index is loaded from the database when the server starts (see
+#   EcomConfig.ready, or on first use otherwise) and then kept current by the
+#   Product signals. It remembers the names version it reflects
+#   (catalog_cache.get_names_version); if another process changed a product,
+#   the version differs and the index is reloaded on the next lookup.
+
+MAX_SUGGESTIONS = 20
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def name_keys(name):
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+        self.names = {}
+        self.version = None
+
+    def load(self, products, version):
+        entries = []
+        names = {}
+        for product_id, name in products:
+            names[product_id] = name
+            entries.extend((key, product_id) for key in name_keys(name))
+        entries.sort()
+
+        with self.lock:
+            self.entries = entries
+            self.names = names
+            self.version = version
+
+    def _remove(self, product_id):
+        name = self.names.pop(product_id, None)
+        if name is None:
+            return
+        for key in name_keys(name):
+            i = bisect_left(self.entries, (key, product_id))
+            if i < len(self.entries) and self.entries[i] == (key, product_id):
+                del self.entries[i]
+
+    def _advance(self, version):
+        if version is None:
+            return
+        # Only step from the version just before; a skipped bump means this
+        # process missed changes, so drop the version and reload on next use
+        self.version = version if self.version == version - 1 else None
+
+    def add(self, product_id, name, version=None):
+        with self.lock:
+            self._remove(product_id)
+            self.names[product_id] = name
+            for key in name_keys(name):
+                insort(self.entries, (key, product_id))
+            self._advance(version)
+
+    def remove(self, product_id, version=None):
+        with self.lock:
+            self._remove(product_id)
+            self._advance(version)
+
+    def suggest(self, prefix, limit=8):
+        """Names of up to `limit` products with a word starting with `prefix`."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self.lock:
+            i = bisect_left(self.entries, (prefix,))
+            while i < len(self.entries) and len(results) < limit:
+                key, product_id = self.entries[i]
+                if not key.startswith(prefix):
+                    break
+                if product_id not in seen:
+                    seen.add(product_id)
+                    results.append({'id': product_id, 'name': self.names[product_id]})
+                i += 1
+        return results
+
+
+_index = PrefixIndex()
+
+
+def get_index():
+    version = catalog_cache.get_names_version()
+    if _index.version != version:
+        _index.load(models.Product.objects.values_list('id', 'name'), version)
+    return _index
+
+
+def suggest(prefix, limit=8):
+    return get_index().suggest(prefix, min(limit, MAX_SUGGESTIONS))
+
+
+# Signal hooks: only patch an index that has been loaded, an unloaded one
+# reads the current names when it is first used.
+
+def index_product(product, version):
+    if _index.version is not None:
+        _index.add(product.pk, product.name, version)
+
+
+def remove_product(product_id, version):
+    if _index.version is not None:
+        _index.remove(product_id, version)
@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+
+#   Usage:  {% load product_images %}
+#           <img src="{{ p|image_url:300 }}">
+#           <source type="image/webp" srcset="{{ p|webp_url:300 }}">
+
+
+@register.filter
+def image_url(product, width):
+    return product.get_image_url_for(int(width))
+
+
+@register.filter
+def webp_url(product, width):
+    return product.get_image_url_for(int(width), webp=True) or ''
@@ -1,13 +1,35 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.conf import settings
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
-from ecom.models import Customer, Product, Orders
+from django.core.management import call_command
+from ecom.models import (
+    Customer, Product, Orders, Cart, PaymentErrorLogs,
+    DailySales, DailyProductSales, DailyStatusCount, RollupWatermark,
+)
+from django.db import connection, transaction
+import csv
 import json
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
 
 
 class EcommerceTestCase(TestCase):
     def setUp(self):
         """Set up test data"""
+        # Cached counters are keyed by ids that get reused between tests
+        cache.clear()
+
         # Create user and customer
         self.user = User.objects.create_user(
             username='testuser',
@@ -43,6 +65,11 @@ class EcommerceTestCase(TestCase):
 
         self.client = Client()
 
+    def login_admin(self):
+        """Log the test client in as a superuser, for the admin pages"""
+        User.objects.create_superuser(username='boss', password='testpass123', email='boss@example.com')
+        self.client.login(username='boss', password='testpass123')
+
     def test_add_to_cart(self):
         """Test adding products to cart"""
         response = self.client.get(f'/add-to-cart/{self.product1.id}')
@@ -158,7 +185,10 @@ class EcommerceTestCase(TestCase):
         )
 
         # Download invoice
-        response = self.client.get(f'/download-invoice/{order.id}/{self.product1.id}')
+        invoice_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, invoice_root, ignore_errors=True)
+        with override_settings(INVOICE_ROOT=invoice_root):
+            response = self.client.get(f'/download-invoice/{order.id}/{self.product1.id}')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/pdf')
 
@@ -201,3 +231,734 @@ class EcommerceTestCase(TestCase):
         response = self.client.post('/gpay-payment/', {})
         # Should return error for invalid request
         self.assertEqual(response.status_code, 400)
+
+    def test_search_view_matches_description_and_ranks_name_first(self):
+        """Test full-text search covers description and ranks name hits first"""
+        Product.objects.create(name='Plain Mug', price=50, description='Ceramic coffee cup')
+        coffee = Product.objects.create(name='Coffee Grinder', price=900, description='Steel burr grinder')
+
+        response = self.client.get('/search', {'query': 'coffee'})
+        self.assertEqual(response.status_code, 200)
+
+        products = list(response.context['products'])
+        self.assertEqual(len(products), 2)
+        self.assertEqual(products[0], coffee)
+
+        # Deleted products drop out of the index
+        with self.captureOnCommitCallbacks(execute=True):
+            coffee.delete()
+        response = self.client.get('/search', {'query': 'coffee'})
+        self.assertEqual(len(response.context['products']), 1)
+
+    def test_home_view_keyset_pagination(self):
+        """Test storefront grid pages with ?after=<id> cursors"""
+        for i in range(10):
+            Product.objects.create(name=f'Bulk Product {i}', price=10 + i, description='Bulk')
+
+        response = self.client.get('/')
+        first_page = response.context['products']
+        self.assertEqual(len(first_page), 9)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+
+        response = self.client.get('/', {'after': first_page.next_cursor})
+        second_page = response.context['products']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertGreater(second_page[0].id, first_page.next_cursor)
+
+    def test_product_grid_cache_invalidated_by_catalog_version(self):
+        """Test cached grid pages are served until a product change bumps the version"""
+        response = self.client.get('/')
+        self.assertContains(response, 'Test Product 1')
+
+        # A queryset update bypasses signals, so the cached page is still served
+        Product.objects.filter(pk=self.product1.pk).update(name='Renamed Product')
+        response = self.client.get('/')
+        self.assertContains(response, 'Test Product 1')
+
+        # Saving through the model bumps the catalog version once committed
+        self.product1.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product1.save()
+        response = self.client.get('/')
+        self.assertContains(response, 'Renamed Product')
+
+    def test_anonymous_home_page_is_publicly_cacheable(self):
+        """Test anonymous storefront pages are shared-cacheable and the badge comes from cart-summary"""
+        from ecom import cart_cookie
+        self.client.cookies['product_ids'] = cart_cookie.encode({self.product1.id: 2, self.product2.id: 1})
+
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('cookie', response.get('Vary', '').lower())
+        self.assertTrue(response.has_header('ETag'))
+        self.assertNotIn('name="csrfmiddlewaretoken"', response.content.decode())
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/search', {'query': 'product'})
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('cookie', response.get('Vary', '').lower())
+
+        response = self.client.get('/cart-summary')
+        self.assertEqual(response.json(), {'product_count_in_cart': 2})
+
+    def test_product_image_variants_generated_on_save(self):
+        """Test saving a product image writes resized and WebP copies used by the grid"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, format='PNG')
+        upload = SimpleUploadedFile('shoe.png', buffer.getvalue(), content_type='image/png')
+
+        with override_settings(MEDIA_ROOT=media_root, PRODUCT_IMAGE_ASYNC=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.create(name='Shoe', price=50, description='Red shoe', product_image=upload)
+
+            product.refresh_from_db()
+            self.assertEqual(product.image_variants['source'], product.product_image.name)
+            thumbnail = product.image_variants['widths']['300']
+            with Image.open(product.product_image.storage.path(thumbnail['original'])) as image:
+                self.assertEqual(image.size, (300, 200))
+            with Image.open(product.product_image.storage.path(thumbnail['webp'])) as image:
+                self.assertEqual(image.format, 'WEBP')
+
+            self.assertTrue(product.get_image_url_for(250).endswith('shoe_300.png'))
+            self.assertTrue(product.get_image_url_for(300, webp=True).endswith('shoe_300.webp'))
+
+            response = self.client.get('/')
+            self.assertContains(response, 'shoe_300.webp')
+
+    def test_external_product_image_downloaded_once_and_served_locally(self):
+        """Test external image URLs are fetched once into media and rewritten to the local copy"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+
+        buffer = BytesIO()
+        Image.new('RGB', (900, 900), 'blue').save(buffer, format='JPEG')
+        image_bytes = buffer.getvalue()
+        requests_seen = []
+
+        class ImageHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests_seen.append(self.path)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(image_bytes)))
+                self.end_headers()
+                self.wfile.write(image_bytes)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), ImageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/photos/lamp.jpg'
+
+        with override_settings(MEDIA_ROOT=media_root, PRODUCT_IMAGE_ASYNC=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                lamp = Product.objects.create(name='Lamp', price=30, description='Desk lamp', product_image=url)
+                desk = Product.objects.create(name='Desk', price=90, description='With lamp', product_image=url)
+
+            lamp.refresh_from_db()
+            desk.refresh_from_db()
+            self.assertEqual(len(requests_seen), 1)
+            self.assertTrue(lamp.get_image_url.startswith('/media/product_image/remote/'))
+            self.assertEqual(lamp.get_image_url, desk.get_image_url)
+            self.assertIn('/product_image/derived/', lamp.get_image_url_for(300, webp=True))
+
+    def test_search_suggest_uses_in_memory_prefix_index(self):
+        """Test autocomplete matches any word prefix, follows product changes and skips the database"""
+        with self.captureOnCommitCallbacks(execute=True):
+            shoe = Product.objects.create(name='Red Running Shoe', price=80, description='Fast')
+        self.client.get('/search/suggest', {'q': 'x'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/search/suggest', {'q': 'RUN'})
+        self.assertEqual(response.json()['suggestions'], [{'id': shoe.id, 'name': 'Red Running Shoe'}])
+
+        # Catalog changes that leave names alone (images, jobs) keep the index
+        from ecom import catalog_cache
+        catalog_cache.bump_catalog_version()
+        with self.assertNumQueries(0):
+            self.client.get('/search/suggest', {'q': 'run'})
+
+        shoe.name = 'Blue Trail Shoe'
+        with self.captureOnCommitCallbacks(execute=True):
+            shoe.save()
+            Product.objects.create(name='Trail Mix', price=5, description='Snack')
+        with self.assertNumQueries(0):
+            response = self.client.get('/search/suggest', {'q': 'trail'})
+        names = [s['name'] for s in response.json()['suggestions']]
+        self.assertEqual(names, ['Trail Mix', 'Blue Trail Shoe'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shoe.delete()
+        response = self.client.get('/search/suggest', {'q': 'run'})
+        self.assertEqual(response.json()['suggestions'], [])
+
+    def test_search_suggest_index_reloads_after_missed_version(self):
+        """Test a patch that skips catalog versions drops the index version instead of stamping it current"""
+        from ecom import suggest
+        index = suggest.PrefixIndex()
+        index.load([(1, 'Red Shoe')], 10)
+        index.add(2, 'Blue Shoe', 11)
+        self.assertEqual(index.version, 11)
+
+        # Version 12 was bumped elsewhere, this process never saw it
+        index.add(3, 'Green Shoe', 13)
+        self.assertIsNone(index.version)
+
+    def test_search_view_falls_back_to_similar_names_for_typos(self):
+        """Test a misspelled search with no exact hits returns products with similar names"""
+        shoe = Product.objects.create(name='Running Shoe', price=80, description='Fast')
+        Product.objects.create(name='Coffee Mug', price=10, description='Ceramic')
+
+        response = self.client.get('/search', {'query': 'runing shoo'})
+        products = response.context['products']
+        self.assertTrue(products.approximate)
+        self.assertEqual([p.id for p in products], [shoe.id])
+        self.assertContains(response, 'showing similar products')
+
+        # Enough exact hits, no fuzzy stage
+        Product.objects.create(name='Product Stand', price=15, description='Display')
+        response = self.client.get('/search', {'query': 'product'})
+        self.assertFalse(response.context['products'].approximate)
+
+    def test_search_view_with_few_exact_hits_keeps_them_first(self):
+        """Test one exact hit is shown first and the page doesn't claim there were no exact matches"""
+        machine = Product.objects.create(name='Espresso Machine', price=300, description='Steam')
+        Product.objects.create(name='Expresso Cups', price=20, description='Set of two')
+
+        response = self.client.get('/search', {'query': 'espresso'})
+        products = response.context['products']
+        self.assertFalse(products.approximate)
+        self.assertEqual([p.id for p in products][0], machine.id)
+        self.assertNotContains(response, 'No exact matches')
+        self.assertContains(response, 'also showing similar products')
+
+    def test_price_facets_filter_and_sort_product_grid(self):
+        """Test price sort pages by (price, id), price ranges filter, and bucket counts come from one query"""
+        from ecom import facets
+        for i in range(10):
+            Product.objects.create(name=f'Gadget {i}', price=600 + i * 100, description='Gadget')
+
+        response = self.client.get('/', {'sort': 'price_desc'})
+        first_page = response.context['products']
+        prices = [p.price for p in first_page]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+        self.assertEqual(prices[0], 1500)
+
+        response = self.client.get('/', {'sort': 'price_desc', 'after': first_page.next_cursor})
+        second_page = [p.price for p in response.context['products']]
+        self.assertEqual(second_page, [600, 200, 100])
+        response = self.client.get('/', {'sort': 'price_desc', 'before': response.context['products'].previous_cursor})
+        self.assertEqual([p.price for p in response.context['products']], prices)
+
+        response = self.client.get('/', {'min_price': 500, 'max_price': 1000})
+        self.assertEqual(sorted(p.price for p in response.context['products']), [600, 700, 800, 900])
+
+        with self.assertNumQueries(1):
+            counts = facets.price_facets(Product.objects.all())
+        self.assertEqual((counts['min'], counts['max']), (100, 1500))
+        self.assertEqual([b['count'] for b in counts['buckets']], [2, 4, 6, 0, 0])
+
+        response = self.client.get('/search', {'query': 'gadget', 'sort': 'price_asc'})
+        self.assertEqual(response.context['products'][0].price, 600)
+
+    def test_product_api_cursor_pages_sparse_fields_and_etag(self):
+        """Test /api/products/ pages by cursor, returns only requested fields and honours If-None-Match"""
+        for i in range(3):
+            Product.objects.create(name=f'API Product {i}', price=10 + i, description='Listed')
+
+        response = self.client.get('/api/products/', {'fields': 'id,name', 'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(set(data['results'][0]), {'id', 'name'})
+        self.assertIn('cursor=', data['next'])
+
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        self.assertGreater(second['results'][0]['id'], data['results'][-1]['id'])
+
+        response = self.client.get('/api/products/', {'fields': 'id,name', 'page_size': 3}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/api/products/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cart_context_is_one_query_with_db_side_subtotals(self):
+        """Test the cart summary loads lines, products and subtotals in a single query"""
+        from ecom.views import CartSummary
+        Cart.objects.create(customer=self.customer, product=self.product1, quantity=2, total_price=200)
+        Cart.objects.create(customer=self.customer, product=self.product2, quantity=1, total_price=200)
+
+        with self.assertNumQueries(1):
+            cart = CartSummary.for_customer_user(self.user)
+            names = [item['product'].name for item in cart.products_with_quantity]
+
+        self.assertEqual(names, ['Test Product 1', 'Test Product 2'])
+        self.assertEqual([item['subtotal'] for item in cart.products_with_quantity], [200, 200])
+        self.assertEqual(cart['total'], 400)
+        self.assertEqual(cart.product_count_in_cart, 2)
+
+    def test_cart_badge_counter_follows_cart_mutations_without_queries(self):
+        """Test the cached cart line counter is kept current by the cart views"""
+        from ecom import cart_counter
+        self.client.login(username='testuser', password='testpass123')
+
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        self.client.get(f'/increment-cart-item-view/{self.product2.id}')
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_counter.get_count(self.user), 2)
+
+        self.client.get(f'/decrement-cart-item-view/{self.product2.id}')
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_counter.get_count(self.user), 1)
+
+        self.client.get(f'/remove-from-cart/{self.product1.id}')
+        self.assertEqual(self.client.get('/cart-summary').json(), {'product_count_in_cart': 0})
+
+    def test_cookie_cart_merged_into_db_cart_in_constant_queries(self):
+        """Test the guest cart is merged at login with a fixed number of queries whatever its size"""
+        from ecom.cart_cookie import CookieCart, encode
+        from ecom.views import sync_cookie_cart_to_db
+        Cart.objects.create(customer=self.customer, product=self.product1, quantity=5, total_price=500)
+        extra = [Product.objects.create(name=f'Bulk {i}', price=10, description='Bulk') for i in range(20)]
+
+        entries = {self.product1.id: 2, self.product2.id: 3, 99999: 1, **{p.id: 1 for p in extra}}
+        request = RequestFactory().get('/afterlogin')
+        request.user = self.user
+        request.COOKIES['product_ids'] = encode(entries)
+        request.cart = CookieCart.from_request(request)
+
+        with CaptureQueriesContext(connection) as queries:
+            sync_cookie_cart_to_db(request)
+        self.assertLessEqual(len(queries), 8)
+        self.assertFalse(request.cart)
+        self.assertTrue(request.cart.dirty)
+
+        lines = {line.product_id: line for line in Cart.objects.filter(customer=self.customer)}
+        self.assertEqual(len(lines), 22)
+        self.assertEqual(lines[self.product1.id].quantity, 5)
+        self.assertEqual(lines[self.product2.id].quantity, 3)
+        self.assertEqual(lines[self.product2.id].total_price, 600)
+
+    def test_guest_cart_cookie_is_signed_and_bounded(self):
+        """Test the guest cart cookie is signed, tamper-proof, size limited and only written on change"""
+        from ecom import cart_cookie
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        value = self.client.cookies['product_ids'].value
+        self.assertTrue(value.startswith('v1|'))
+        self.assertEqual(cart_cookie.decode(value), {self.product1.id: 2})
+
+        # A forged quantity fails the signature and the cart reads as empty
+        self.client.cookies['product_ids'] = value.replace(f'{self.product1.id}:2', f'{self.product1.id}:50', 1)
+        self.assertEqual(self.client.get('/cart-summary').json(), {'product_count_in_cart': 0})
+        self.assertEqual(cart_cookie.decode('v1|1:1|' + 'x' * 4096), {})
+
+        # Unsigned (legacy format) carts are rejected
+        self.client.cookies['product_ids'] = f'{self.product1.id}:1|{self.product2.id}:3'
+        self.assertEqual(self.client.get('/cart-summary').json(), {'product_count_in_cart': 0})
+        self.assertEqual(cart_cookie.decode(f'{self.product1.id}:1'), {})
+
+        # Unchanged carts are read but the response sets no cookie
+        self.client.cookies['product_ids'] = cart_cookie.encode({self.product1.id: 1, self.product2.id: 3})
+        response = self.client.get('/cart-summary')
+        self.assertEqual(response.json(), {'product_count_in_cart': 2})
+        self.assertNotIn('product_ids', response.cookies)
+
+        cart = cart_cookie.CookieCart()
+        for pid in range(1, 100):
+            cart.add(pid, 500)
+        self.assertEqual(len(cart), settings.CART_COOKIE_MAX_LINES)
+        self.assertEqual(cart.quantity(1), settings.CART_COOKIE_MAX_QUANTITY)
+
+    @override_settings(GUEST_CART_STORE='cache')
+    def test_guest_cart_in_server_side_store(self):
+        """Test the cache guest cart store keeps only an opaque id in the cookie and merges at login"""
+        from ecom import guest_cart
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        self.client.get(f'/add-to-cart/{self.product2.id}')
+        self.client.get(f'/add-to-cart/{self.product2.id}')
+        self.assertNotIn('product_ids', self.client.cookies)
+        cart_id = self.client.cookies['guest_cart'].value
+        self.assertEqual(len(cart_id), 22)
+        self.assertEqual(guest_cart.get_store().get(guest_cart.cache_key(cart_id)),
+                         {self.product1.id: 1, self.product2.id: 2})
+        self.assertEqual(self.client.get('/cart-summary').json(), {'product_count_in_cart': 2})
+
+        # A guessed / expired id is just an empty cart
+        self.client.cookies['guest_cart'] = 'x' * 22
+        self.assertEqual(self.client.get('/cart-summary').json(), {'product_count_in_cart': 0})
+
+        cart = guest_cart.CacheCart()
+        for pid in range(1, 301):
+            cart.add(pid)
+        self.assertEqual(len(cart), 300)
+
+        # Login merges the cart and drops the cache entry
+        self.client.cookies['guest_cart'] = cart_id
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get('/afterlogin')
+        self.assertEqual(Cart.objects.get(customer=self.customer, product=self.product2).quantity, 2)
+        self.assertIsNone(guest_cart.get_store().get(guest_cart.cache_key(cart_id)))
+
+    def test_cart_api_returns_changed_lines(self):
+        """Test the JSON cart API applies single and batched operations and returns only the deltas"""
+        ops = {'ops': [
+            {'op': 'add', 'product': self.product1.id},
+            {'op': 'increment', 'product': self.product1.id},
+            {'op': 'add', 'product': self.product2.id},
+            {'op': 'add', 'product': 99999},
+        ]}
+        response = self.client.post('/cart/api', json.dumps(ops), content_type='application/json')
+        self.assertEqual(response.json(), {
+            'lines': [
+                {'product': self.product1.id, 'quantity': 2, 'subtotal': 200},
+                {'product': self.product2.id, 'quantity': 1, 'subtotal': 200},
+                {'product': 99999, 'quantity': 0, 'subtotal': 0},
+            ],
+            'total': 400,
+            'product_count_in_cart': 2,
+        })
+        self.assertEqual(self.client.get(f'/cart/api/remove/{self.product1.id}').status_code, 405)
+        self.assertEqual(self.client.post('/cart/api/explode/1').status_code, 400)
+
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get('/afterlogin')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/cart/api/decrement/{self.product1.id}')
+        self.assertEqual(response.json(), {
+            'lines': [{'product': self.product1.id, 'quantity': 1, 'subtotal': 100}],
+            'total': 300,
+            'product_count_in_cart': 2,
+        })
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(self.client.get('/cart-summary').json(), {'product_count_in_cart': 2})
+
+        # Accounts without a customer profile get an error, not a 500
+        self.login_admin()
+        response = self.client.post(f'/cart/api/add/{self.product1.id}')
+        self.assertEqual(response.status_code, 403)
+
+    def test_checkout_uses_cart_snapshot_from_payment_session(self):
+        """Test orders are created from the cart frozen into the payment session, not the live cart"""
+        from ecom.views import CartSummary, create_payment_session
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        self.client.get(f'/add-to-cart/{self.product1.id}')
+        self.client.get(f'/add-to-cart/{self.product2.id}')
+
+        cart_data = CartSummary.for_customer_user(self.user).snapshot()
+        self.assertEqual(cart_data['total'], 400)
+        session = create_payment_session('txn-snapshot', 'stripe', self.user.id, 'test@example.com',
+                                         cart_data['total'], cart_data, {})
+        session.mark_as_validated()
+
+        # Changing the cart after paying must not change the order
+        self.client.get(f'/add-to-cart/{self.product2.id}')
+        self.client.cookies['transaction_id'] = 'txn-snapshot'
+        self.client.cookies['email'] = 'test@example.com'
+        response = self.client.get('/payment-success', {
+            'validation_token': session.validation_token, 'payment_type': 'stripe',
+            'amount': 40000, 'id': 'cs_test', 'name': 'Test', 'email': 'test@example.com',
+        })
+        self.assertEqual(response.status_code, 200)
+        orders = {order.product_id: order.quantity for order in Orders.objects.filter(transaction_id='txn-snapshot')}
+        self.assertEqual(orders, {self.product1.id: 2, self.product2.id: 1})
+        self.assertFalse(Cart.objects.filter(customer=self.customer).exists())
+
+    def test_payment_success_places_orders_in_constant_queries(self):
+        """Test order placement costs the same number of queries for a 2 line and a 12 line cart"""
+        from ecom.views import create_payment_session
+        self.client.login(username='testuser', password='testpass123')
+        extra = [Product.objects.create(name=f'Order {i}', price=10, description='Order') for i in range(10)]
+
+        def checkout(products, transaction_id):
+            for product in products:
+                Cart.objects.create(customer=self.customer, product=product, quantity=1, total_price=product.price)
+            cart_data = {'total': 0, 'products': [{'id': p.id, 'quantity': 1} for p in products]}
+            session = create_payment_session(transaction_id, 'google-pay', self.user.id, 'test@example.com', 1, cart_data, {})
+            session.mark_as_validated()
+            self.client.cookies['transaction_id'] = transaction_id
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/payment-success', {
+                    'validation_token': session.validation_token, 'payment_type': 'google-pay', 'amount': 1,
+                })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(Orders.objects.filter(transaction_id=transaction_id).count(), len(products))
+            self.assertFalse(Cart.objects.filter(customer=self.customer).exists())
+            return len(queries)
+
+        self.assertEqual(checkout([self.product1, self.product2], 'txn-small'), checkout(extra + [self.product1, self.product2], 'txn-large'))
+
+    def test_my_orders_keyset_pages_newest_first(self):
+        """Test my orders pages newest first with the same query count however many orders exist"""
+        self.client.login(username='testuser', password='testpass123')
+        orders = [
+            Orders.objects.create(customer=self.customer, product=self.product1 if i % 2 else self.product2,
+                                  address=f'Street {i}', status='Pending')
+            for i in range(12)
+        ]
+
+        response = self.client.get('/my-order')
+        self.assertEqual([order.id for order in response.context['data']], [o.id for o in orders[::-1][:5]])
+        self.assertContains(response, f'after={orders[7].id}')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/my-order', {'after': orders[7].id})
+        self.assertEqual([order.id for order in response.context['data']], [o.id for o in orders[6:1:-1]])
+        first_page_queries = len(queries)
+
+        for i in range(30):
+            Orders.objects.create(customer=self.customer, product=self.product1, status='Pending')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/my-order', {'before': orders[1].id})
+        self.assertEqual([order.id for order in response.context['data']], [o.id for o in orders[6:1:-1]])
+        self.assertEqual(len(queries), first_page_queries)
+
+    def test_admin_order_board_filters_and_pages(self):
+        """Test the admin order board filters by status and date and pages in constant queries"""
+        self.login_admin()
+        delivered = [
+            Orders.objects.create(customer=self.customer, product=self.product1, status='Delivered' if i % 3 else 'Pending')
+            for i in range(36)
+        ]
+        delivered = [order for order in delivered if order.status == 'Delivered']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin-view-booking', {'status': 'Delivered'})
+        self.assertEqual([order.id for order in response.context['data']], [o.id for o in delivered[::-1][:10]])
+        self.assertContains(response, f'status=Delivered&after={delivered[-10].id}')
+        first_page_queries = len(queries)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin-view-booking', {'status': 'Delivered', 'after': delivered[-10].id})
+        self.assertEqual([order.id for order in response.context['data']], [o.id for o in delivered[::-1][10:20]])
+        self.assertEqual(len(queries), first_page_queries)
+
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        response = self.client.get('/admin-view-booking', {'date_from': tomorrow})
+        self.assertEqual(len(response.context['data']), 0)
+        response = self.client.get('/admin-view-booking', {'status': 'Bogus', 'date_to': 'garbage'})
+        self.assertEqual(len(response.context['data']), 10)
+
+    def test_admin_dashboard_counts_from_cached_counters(self):
+        """Test the admin dashboard reads counters kept current by signals in constant queries"""
+        self.login_admin()
+
+        def dashboard():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/admin-dashboard')
+            context = response.context
+            return (context['customercount'], context['productcount'], context['ordercount']), len(queries)
+
+        counts, _ = dashboard()
+        self.assertEqual(counts, (1, 2, 0))
+        counts, warm_queries = dashboard()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(15):
+                Orders.objects.create(customer=self.customer, product=self.product1, status='Pending')
+            Product.objects.create(name='Counted', price=5, description='Counted')
+            self.product2.delete()
+        counts, queries = dashboard()
+        self.assertEqual(counts, (1, 2, 15))
+        self.assertEqual(queries, warm_queries)
+
+        # A rolled back create leaves the counter alone
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Orders.objects.create(customer=self.customer, product=self.product1, status='Pending')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        counts, _ = dashboard()
+        self.assertEqual(counts, (1, 2, 15))
+        self.assertEqual(len(self.client.get('/admin-dashboard').context['data']), 10)
+
+    def test_sales_rollup_is_incremental_and_rerunnable(self):
+        """Test the sales rollup aggregates only new orders, is idempotent and feeds the admin sales page"""
+
+        def order(day, product, quantity, order_id, status='Pending'):
+            placed = Orders.objects.create(customer=self.customer, product=product, quantity=quantity,
+                                           order_id=order_id, status=status)
+            Orders.objects.filter(id=placed.id).update(order_date=day)
+            return placed
+
+        order(date(2026, 3, 1), self.product1, 2, 'a')
+        order(date(2026, 3, 1), self.product2, 1, 'a', 'Delivered')
+        order(date(2026, 3, 2), self.product1, 1, 'b')
+        call_command('rollup_sales', stdout=StringIO())
+
+        day1 = DailySales.objects.get(date=date(2026, 3, 1))
+        self.assertEqual((day1.orders, day1.units, day1.revenue), (1, 3, 400))
+        self.assertEqual(DailyProductSales.objects.get(date=date(2026, 3, 1), product=self.product1).revenue, 200)
+        self.assertEqual(DailyStatusCount.objects.get(date=date(2026, 3, 1), status='Delivered').orders, 1)
+
+        # A new order touches only its own day, and reruns change nothing
+        last = order(date(2026, 3, 2), self.product2, 3, 'c')
+        call_command('rollup_sales', stdout=StringIO())
+        call_command('rollup_sales', stdout=StringIO())
+        self.assertEqual(RollupWatermark.objects.get(name='daily_sales').last_order_id, last.id)
+        day2 = DailySales.objects.get(date=date(2026, 3, 2))
+        self.assertEqual((day2.orders, day2.units, day2.revenue), (2, 4, 700))
+        self.assertEqual(DailySales.objects.count(), 2)
+        self.assertEqual(DailyProductSales.objects.count(), 4)
+
+        self.login_admin()
+        response = self.client.get('/admin-sales', {'date_from': '2026-03-01', 'date_to': '2026-03-31'})
+        self.assertEqual(response.context['total_revenue'], 1100)
+        self.assertEqual(response.context['top_products'][0]['product__name'], self.product2.name)
+        self.assertEqual([day.percent for day in response.context['days']], [57, 100])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_streaming_exports(self):
+        """Test orders and payment logs stream as CSV / JSONL from the admin endpoint and the command"""
+        for i in range(5):
+            Orders.objects.create(customer=self.customer, product=self.product1, quantity=i + 1,
+                                  status='Delivered' if i % 2 else 'Pending', order_id=f'o{i}')
+        PaymentErrorLogs.objects.create(payment_type='stripe', error_message='Card, "declined"', transaction_id='t1')
+
+        self.login_admin()
+        response = self.client.get('/admin-export/orders', {'status': 'Pending'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['order_id'] for row in rows], ['o0', 'o2', 'o4'])
+        self.assertEqual(rows[0]['product__name'], self.product1.name)
+
+        response = self.client.get('/admin-export/payment-error-logs', {'format': 'jsonl'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0]['error_message'], 'Card, "declined"')
+        self.assertEqual(self.client.get('/admin-export/customers').status_code, 404)
+
+        out = StringIO()
+        call_command('export_records', 'orders', '--format', 'jsonl', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+
+    def test_csv_export_escapes_formulas(self):
+        """Test customer-entered cells that a spreadsheet would run as formulas are exported as text"""
+        Orders.objects.create(customer=self.customer, product=self.product1, order_id='f1',
+                              address='=HYPERLINK("http://evil")', email='@SUM(A1)', mobile='+123')
+        self.login_admin()
+        response = self.client.get('/admin-export/orders')
+        [row] = csv.DictReader(StringIO(b''.join(response.streaming_content).decode()))
+        self.assertEqual(row['address'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(row['email'], "'@SUM(A1)")
+        self.assertEqual(row['mobile'], "'+123")
+        self.assertEqual(row['order_id'], 'f1')
+
+    def test_invoice_rendered_once_per_order_and_served_with_etag(self):
+        """Test one stored invoice PDF per order_id, served with an ETag and re-rendered only after a change"""
+        from ecom import invoices
+        invoice_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, invoice_root, ignore_errors=True)
+        first = Orders.objects.create(customer=self.customer, product=self.product1, quantity=2,
+                                      order_id='inv-1', status='Pending', email='test@example.com')
+        second = Orders.objects.create(customer=self.customer, product=self.product2, quantity=1,
+                                       order_id='inv-1', status='Pending', email='test@example.com')
+        self.client.login(username='testuser', password='testpass123')
+
+        with override_settings(INVOICE_ROOT=invoice_root, INVOICE_ASYNC=False):
+            with mock.patch.object(invoices, 'render_pdf', wraps=invoices.render_pdf) as render:
+                response = self.client.get(f'/download-invoice/{first.id}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'application/pdf')
+                etag = response['ETag']
+                [invoice_dir] = os.listdir(invoice_root)
+                self.assertEqual(len(os.listdir(os.path.join(invoice_root, invoice_dir))), 1)
+
+                # The other line is on the same invoice, and a revalidation gets a 304
+                self.assertEqual(self.client.get(f'/download-invoice/{second.id}')['ETag'], etag)
+                self.assertEqual(self.client.get(f'/download-invoice/{first.id}', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertEqual(render.call_count, 1)
+
+                # A status change renders the new invoice after commit, off the download path
+                with self.captureOnCommitCallbacks(execute=True):
+                    second.status = 'Delivered'
+                    second.save()
+                self.assertEqual(render.call_count, 2)
+                response = self.client.get(f'/download-invoice/{first.id}', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertEqual(render.call_count, 2)
+                # The superseded PDF was deleted
+                digest = response['ETag'].strip('"')
+                self.assertEqual(os.listdir(os.path.join(invoice_root, invoice_dir)), [f'{digest}.pdf'])
+
+            # A failed background render is logged, not raised into the caller
+            with mock.patch.object(invoices, 'render_pdf', side_effect=ValueError('broken')):
+                first.status = 'Out for Delivery'
+                with self.captureOnCommitCallbacks(execute=True):
+                    first.save()
+
+            # Other customers' invoices are not reachable
+            other = User.objects.create_user(username='other', password='testpass123')
+            Customer.objects.create(user=other, address='Elsewhere', mobile='1')
+            Group.objects.get_or_create(name='CUSTOMER')[0].user_set.add(other)
+            self.client.login(username='other', password='testpass123')
+            self.assertEqual(self.client.get(f'/download-invoice/{first.id}').status_code, 404)
+
+    def test_invoice_scheduled_by_checkout_id(self):
+        """Test a checkout's invoice is rendered from (customer, order_id), without order primary keys"""
+        from ecom import invoices
+        invoice_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, invoice_root, ignore_errors=True)
+        Orders.objects.bulk_create([
+            Orders(customer=self.customer, product=product, quantity=1, order_id='bulk-1', status='Pending')
+            for product in (self.product1, self.product2)
+        ])
+        with override_settings(INVOICE_ROOT=invoice_root, INVOICE_ASYNC=False):
+            invoices.schedule_for(self.customer.id, 'bulk-1')
+            invoices.schedule_for(self.customer.id, 'missing')
+        [invoice_dir] = os.listdir(invoice_root)
+        self.assertEqual(len(os.listdir(os.path.join(invoice_root, invoice_dir))), 1)
+
+
+class CartConcurrencyTestCase(TransactionTestCase):
+    def test_parallel_increments_are_not_lost(self):
+        """Test parallel add-to-cart clicks all land on one line with the right quantity and total"""
+        from ecom.views import add_cart_quantity
+        user = User.objects.create_user(username='racer', password='testpass123')
+        customer = Customer.objects.create(user=user, address='1 Fast Lane', mobile='1234567890')
+        product = Product.objects.create(name='Hot Item', price=25, description='Everyone wants it')
+
+        workers = 8
+        clicks_per_worker = 5
+        start = threading.Barrier(workers)
+        errors = []
+
+        def click():
+            try:
+                start.wait()
+                for _ in range(clicks_per_worker):
+                    add_cart_quantity(customer, product.id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=click) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        line = Cart.objects.get(customer=customer, product=product)
+        self.assertEqual(line.quantity, workers * clicks_per_worker)
+        self.assertEqual(line.total_price, 25 * workers * clicks_per_worker)
@@ -0,0 +1,163 @@
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from . import catalog_cache, models
+
+
+#   Typo-tolerant product name matching
+#
+#   Names are compared by the share of character trigrams they have in common
+#   (the same measure as Postgres' pg_trgm similarity()), so "runing shoo"
+#   still finds "Running Shoe".
+#
+#   Postgres -> pg_trgm GIN index on ecom_product.name (migration 0004)
+#   Others   -> in-memory inverted index trigram -> product ids, loaded at
+#               startup and kept current by the Product signals, like the
+#               autocomplete index in ecom.suggest
+#
+#   Only a bounded number of candidates is ever scored: posting lists are
+#   walked rarest trigram first and no new candidates are taken once
+#   TRIGRAM_MAX_CANDIDATES have been seen.
+
+TRIGRAM_MAX_CANDIDATES = 200
+
+
+def trigrams(text):
+    """pg_trgm style trigrams: every word padded with two leading and one trailing space."""
+    grams = set()
+    for word in re.findall(r'\w+', (text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = {}
+        self.grams = {}
+        self.version = None
+
+    def _add(self, product_id, name):
+        grams = trigrams(name)
+        self.grams[product_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(product_id)
+
+    def _remove(self, product_id):
+        for gram in self.grams.pop(product_id, ()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def load(self, products, version):
+        with self.lock:
+            self.postings = {}
+            self.grams = {}
+            for product_id, name in products:
+                self._add(product_id, name)
+            self.version = version
+
+    def _advance(self, version):
+        if version is None:
+            return
+        # Same rule as ecom.suggest: step one version or reload on next use
+        self.version = version if self.version == version - 1 else None
+
+    def add(self, product_id, name, version=None):
+        with self.lock:
+            self._remove(product_id)
+            self._add(product_id, name)
+            self._advance(version)
+
+    def remove(self, product_id, version=None):
+        with self.lock:
+            self._remove(product_id)
+            self._advance(version)
+
+    def similar(self, query, limit, threshold):
+        """[(product id, similarity)] best first, similarity >= threshold."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = {}
+        with self.lock:
+            postings = sorted((self.postings.get(gram, set()) for gram in query_grams), key=len)
+            for ids in postings:
+                # Count hits for the candidates we have, then take new ones
+                # until the set is full. Every id walked is either already a
+                # candidate or becomes one, so at most 2 x the cap per list.
+                for product_id in shared:
+                    if product_id in ids:
+                        shared[product_id] += 1
+                room = TRIGRAM_MAX_CANDIDATES - len(shared)
+                if room <= 0:
+                    continue
+                for product_id in ids:
+                    if product_id not in shared:
+                        shared[product_id] = 1
+                        room -= 1
+                        if not room:
+                            break
+
+            scored = []
+            for product_id, hits in shared.items():
+                score = hits / (len(query_grams) + len(self.grams[product_id]) - hits)
+                if score >= threshold:
+                    scored.append((product_id, score))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+
+_index = TrigramIndex()
+
+
+def get_index():
+    version = catalog_cache.get_names_version()
+    if _index.version != version:
+        _index.load(models.Product.objects.values_list('id', 'name'), version)
+    return _index
+
+
+def similar_product_ids(query, limit):
+    """Ids of the products whose names are most similar to `query`, best first."""
+    threshold = settings.SEARCH_FUZZY_THRESHOLD
+
+    if connection.vendor == 'postgresql':
+        # `%` is pg_trgm's indexed similarity operator (escaped for the DB-API)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM ("
+                "  SELECT id, similarity(name, %s) AS score FROM ecom_product WHERE name %% %s"
+                ") similar WHERE score >= %s ORDER BY score DESC, id LIMIT %s",
+                [query, query, threshold, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    return [product_id for product_id, score in get_index().similar(query, limit, threshold)]
+
+
+# Signal hooks, see ecom.suggest
+
+def index_product(product, version):
+    if _index.version is not None:
+        _index.add(product.pk, product.name, version)
+
+
+def remove_product(product_id, version):
+    if _index.version is not None:
+        _index.remove(product_id, version)
+
+
+def load_at_startup():
+    # Postgres answers from pg_trgm, the in-memory index is never used there
+    if connection.vendor != 'postgresql':
+        get_index()
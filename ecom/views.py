@@ -1,13 +1,21 @@
 from django.shortcuts import render,redirect
-from . import forms,models
+from . import forms,models,search,suggest,facets,catalog_cache,cart_counter,order_board,dashboard_stats,sales_rollup,exports,invoices
 from django.core.paginator import Paginator
-from django.http import HttpResponseRedirect,HttpResponse
+from .pagination import KeysetPaginator, parse_cursor
+from django.http import HttpResponseRedirect,HttpResponse,StreamingHttpResponse,Http404,FileResponse,HttpResponseNotModified
 # from django.core.mail import send_mail
 from django.contrib.auth.models import Group
 from django.contrib.auth.decorators import login_required,user_passes_test
 from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition, require_POST
+import hashlib
 from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Subquery
 
 from .ResumeParser.db_operations import *
 
@@ -131,28 +139,107 @@ def create_payment_session(transaction_id, payment_type, user_id, customer_email
     return payment_session
 
 stripe.api_key = settings.STRIPE_API
-def home_view(request):
-    products_list = models.Product.objects.all().order_by('id')
-
-    # Pagination - 9 products per page
-    paginator = Paginator(products_list, 9)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
 
-    if str(request.user) == "AnonymousUser" or is_admin(request.user):
-        if 'product_ids' in request.COOKIES:
-            product_ids = request.COOKIES['product_ids']
-            counter=product_ids.split('|')
-            product_count_in_cart=len(set(counter))
+def get_product_grid_page(request, filters):
+    after = parse_cursor(request.GET.get('after'))
+    before = parse_cursor(request.GET.get('before'))
+
+    def build():
+        products_list = models.Product.objects.filter(search.price_filter(filters.price_range))
+        # Keyset pagination - 9 products per page (?after=<id> / ?before=<id>),
+        # by id or by (price, id) when sorting by price
+        paginator = KeysetPaginator(products_list, 9, estimate_total=True, order_by=filters.order_by)
+        return paginator.get_page(after, before)
+
+    # Served from the catalog cache until the next product change
+    return catalog_cache.get_or_set('product_grid', [after, before] + filters.cache_parts(), build)
+
+def get_search_results_page(request, query, filters):
+    after = parse_cursor(request.GET.get('after'))
+    before = parse_cursor(request.GET.get('before'))
+
+    def build():
+        # Keyset pagination over the ranked results - 9 products per page
+        results = search.search_products(query, filters.price_range)
+        if filters.order_by:
+            paginator = KeysetPaginator(results.queryset(), 9, estimate_total=True, order_by=filters.order_by)
         else:
-            product_count_in_cart=0
+            paginator = KeysetPaginator(results, 9, estimate_total=True)
+        page = paginator.get_page(after, before)
+        page.approximate = results.approximate
+        page.topped_up = results.topped_up
+        return page
+
+    parts = [search.tokenize(query), after, before] + filters.cache_parts()
+    return catalog_cache.get_or_set('search', parts, build)
+
+def get_price_facet_context(filters, query=None):
+    """Price buckets / sort links for the grid and search templates."""
+    if query is None:
+        counts = catalog_cache.get_or_set('facets', ['grid'], lambda: facets.price_facets(models.Product.objects.all()))
     else:
-        cart_data = get_cart_context(request)
-        product_count_in_cart = cart_data["product_count_in_cart"]
-        
+        counts = catalog_cache.get_or_set(
+            'facets', ['search', search.tokenize(query)],
+            lambda: facets.price_facets(search.search_products(query).queryset())
+        )
+
+    buckets = []
+    for bucket in counts['buckets']:
+        active = (filters.min_price, filters.max_price) == (bucket['min'], bucket['max'])
+        buckets.append(dict(
+            bucket, active=active,
+            querystring=filters.querystring(query, min_price=bucket['min'], max_price=bucket['max'])
+        ))
+    sort_options = [
+        {'label': label, 'active': filters.sort == sort, 'querystring': filters.querystring(query, sort=sort)}
+        for sort, label in (('price_asc', 'Price: Low to High'), ('price_desc', 'Price: High to Low'))
+    ]
+    return {
+        'filters': filters,
+        'price_facets': counts,
+        'price_buckets': buckets,
+        'sort_options': sort_options,
+        'page_query': filters.querystring(query),
+        'clear_filters_query': facets.PriceFilters().querystring(query),
+    }
+
+def storefront_etag(request, *args, **kwargs):
+    # Only anonymous pages are shared between visitors, and they only change
+    # when the catalog does
+    if request.user.is_authenticated or len(get_messages(request)):
+        return None
+    version = catalog_cache.get_catalog_version()
+    return hashlib.md5(f"{version}:{request.get_full_path()}".encode('utf-8')).hexdigest()
+
+def render_storefront_page(request, template, context):
+    """
+    Anonymous storefront pages carry no per-visitor data (the cart badge is
+    fetched from /cart-summary), so the rendered HTML is cached under the
+    catalog version and marked cacheable for browsers and proxies.
+    """
+    if request.user.is_authenticated or len(get_messages(request)):
+        return render(request, template, context)
+
+    html = catalog_cache.get_or_set(
+        'page', [template, request.get_full_path()],
+        lambda: render_to_string(template, context, request)
+    )
+    response = HttpResponse(html)
+    patch_cache_control(response, public=True, max_age=settings.STOREFRONT_CACHE_MAX_AGE)
+    # Same for every guest, SharedCacheMiddleware drops Vary: Cookie
+    response.shared_cache = True
+    return response
+
+@condition(etag_func=storefront_etag)
+def home_view(request):
     if request.user.is_authenticated:
         return HttpResponseRedirect('afterlogin')
-    return render(request,'ecom/index.html',{'products':products,'product_count_in_cart':product_count_in_cart})
+
+    filters = facets.PriceFilters.from_request(request)
+    products = get_product_grid_page(request, filters)
+    context = {'products': products}
+    context.update(get_price_facet_context(filters))
+    return render_storefront_page(request, 'ecom/index.html', context)
 
 
 #for showing login button for admin
@@ -223,26 +310,17 @@ def afterlogin_view(request):
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin , login_url='adminlogin')
 def admin_dashboard_view(request):
-    # for cards on dashboard
-    customercount=models.Customer.objects.all().count()
-    productcount=models.Product.objects.all().count()
-    ordercount=models.Orders.objects.all().count()
-
-    # for recent order tables
-    orders = models.Orders.objects.all().order_by('-id')[:10]
-    ordered_products=[]
-    ordered_bys=[]
-    for order in orders:
-        ordered_product=models.Product.objects.all().filter(id=order.product.id)
-        ordered_by=models.Customer.objects.all().filter(id = order.customer.id)
-        ordered_products.append(ordered_product)
-        ordered_bys.append(ordered_by)
+    # for cards on dashboard, from the cached counters instead of COUNT(*)
+    counts = dashboard_stats.get_counts()
+
+    # for recent order tables, products and customers joined in
+    orders = models.Orders.objects.select_related('product', 'customer__user').order_by('-id')[:10]
 
     mydict={
-    'customercount':customercount,
-    'productcount':productcount,
-    'ordercount':ordercount,
-    'data':zip(ordered_products,ordered_bys,orders),
+    'customercount':counts['customers'],
+    'productcount':counts['products'],
+    'ordercount':counts['orders'],
+    'data':orders,
     }
     return render(request,'ecom/admin_dashboard.html',context=mydict)
 
@@ -313,6 +391,7 @@ def admin_add_product_view(request):
         productForm=forms.ProductForm(request.POST, request.FILES)
         if productForm.is_valid():
             productForm.save()
+            catalog_cache.bump_catalog_version()
         return HttpResponseRedirect('admin-products')
     return render(request,'ecom/admin_add_products.html',{'productForm':productForm})
 
@@ -322,6 +401,7 @@ def admin_add_product_view(request):
 def delete_product_view(request,pk):
     product=models.Product.objects.get(id=pk)
     product.delete()
+    catalog_cache.bump_catalog_version()
     return redirect('admin-products')
 
 
@@ -334,6 +414,7 @@ def update_product_view(request,pk):
         productForm=forms.ProductForm(request.POST,request.FILES,instance=product)
         if productForm.is_valid():
             productForm.save()
+            catalog_cache.bump_catalog_version()
             return redirect('admin-products')
     return render(request,'ecom/admin_update_product.html',{'productForm':productForm})
 
@@ -341,22 +422,20 @@ def update_product_view(request,pk):
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin , login_url='adminlogin')
 def admin_view_booking_view(request):
-    orders = models.Orders.objects.all()[::-1]
-    ordered_products = []
-    ordered_bys = []
-
-    for order in orders:
-        ordered_product = models.Product.objects.filter(id=order.product.id)
-        ordered_by = models.Customer.objects.filter(id=order.customer.id)
-        ordered_products.append(ordered_product)
-        ordered_bys.append(ordered_by)
-
-    # Pagination - 10 orders per page
-    paginator = Paginator(list(zip(ordered_products, ordered_bys, orders)), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    return render( request,'ecom/admin_view_booking.html',{'data': page_obj})
+    filters = order_board.OrderFilters.from_request(request)
+    orders = filters.apply(models.Orders.objects.select_related('product', 'customer__user'))
+
+    # Keyset pagination - 10 orders per page, newest first (?after=<id> / ?before=<id>),
+    # one query per page with product and customer joined in
+    paginator = KeysetPaginator(orders, 10, order_by='-pk')
+    page_obj = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
+
+    return render( request,'ecom/admin_view_booking.html',{
+        'data': page_obj,
+        'filters': filters,
+        'statuses': order_board.STATUSES,
+        'page_query': filters.querystring(),
+    })
 
 
 @login_required(login_url='adminlogin')
@@ -379,6 +458,37 @@ def update_order_view(request,pk):
             return redirect('admin-view-booking')
     return render(request,'ecom/update_order.html',{'orderForm':orderForm})
 
+# CSV / JSONL download of orders and payment logs, streamed row by row
+@login_required(login_url='adminlogin')
+@user_passes_test(is_admin , login_url='adminlogin')
+def admin_export_view(request, kind):
+    if kind not in exports.EXPORTS:
+        raise Http404("Unknown export")
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        fmt = 'csv'
+
+    queryset, fields = exports.get_queryset(kind)
+    if kind == 'orders':
+        # Same ?status= / ?date_from= / ?date_to= filters as the order board
+        queryset = order_board.OrderFilters.from_request(request).apply(queryset)
+
+    response = StreamingHttpResponse(exports.stream(queryset, fields, fmt), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+# daily revenue / top products / status totals from the rollup tables
+@login_required(login_url='adminlogin')
+@user_passes_test(is_admin , login_url='adminlogin')
+def admin_sales_view(request):
+    date_from, date_to = sales_rollup.default_range()
+    date_from = order_board.parse_date(request.GET.get('date_from')) or date_from
+    date_to = order_board.parse_date(request.GET.get('date_to')) or date_to
+
+    context = sales_rollup.sales_report(date_from, date_to)
+    context.update({'date_from': date_from, 'date_to': date_to})
+    return render(request, 'ecom/admin_sales.html', context)
+
 def admin_logs_view(request):
     mydict = dict()
     
@@ -474,96 +584,190 @@ def admin_payment_error_logs_view(request):
 #---------------------------------------------------------------------------------
 #------------------------ PUBLIC CUSTOMER RELATED VIEWS START ---------------------
 #---------------------------------------------------------------------------------
+@condition(etag_func=storefront_etag)
 def search_view(request):
     # whatever user write in search box we get in query
     query = request.GET['query']
-    products_list = models.Product.objects.all().filter(name__icontains=query).order_by('id')
-
-    # Pagination - 9 products per page
-    paginator = Paginator(products_list, 9)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
-
-    if str(request.user) == "AnonymousUser":
-        if 'product_ids' in request.COOKIES:
-            product_ids = request.COOKIES['product_ids']
-            counter=product_ids.split('|')
-            product_count_in_cart=len(set(counter))
-        else:
-            product_count_in_cart=0
-    else:
-        cart_data = get_cart_context(request)
-        product_count_in_cart = cart_data["product_count_in_cart"]
+    filters = facets.PriceFilters.from_request(request)
+    # Ranked full-text search over name and description
+    products = get_search_results_page(request, query, filters)
 
     # word variable will be shown in html when user click on search button
     word="Searched Result :"
+    if getattr(products, 'approximate', False):
+        word="No exact matches, showing similar products :"
+    elif getattr(products, 'topped_up', False):
+        word="Searched Result, also showing similar products :"
+
+    context = {'products':products,'word':word,'query':query}
+    context.update(get_price_facet_context(filters, query))
 
     if request.user.is_authenticated:
-        return render(request,'ecom/customer_home.html',{'products':products,'word':word,'product_count_in_cart':product_count_in_cart,'query':query})
-    return render(request,'ecom/index.html',{'products':products,'word':word,'product_count_in_cart':product_count_in_cart,'query':query})
+        context['product_count_in_cart'] = get_cart_badge_count(request)
+        return render(request,'ecom/customer_home.html',context)
+    return render_storefront_page(request,'ecom/index.html',context)
 
 
-def get_cart_count(product_ids: str):
-    counter = product_ids.split('|')
-    return len(counter)
+# Autocomplete for the search box, answered from the in-memory name index
+def search_suggest_view(request):
+    try:
+        limit = int(request.GET.get('limit', 8))
+    except ValueError:
+        limit = 8
+    suggestions = suggest.suggest(request.GET.get('q', ''), max(limit, 1))
+    response = JsonResponse({'suggestions': suggestions})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
-def get_cart_context(request):
-    total = 0
-    products_with_quantity = []
 
+def get_cart_badge_count(request):
+    # Signed-in customers read the cached counter, guests the cookie - no queries
     if request.user.is_authenticated:
-        customer = models.Customer.objects.get(user=request.user)
-        cart_items = models.Cart.objects.filter(customer=customer)
-
-        for item in cart_items:
-            subtotal = item.product.price * item.quantity
-            total += subtotal
-            products_with_quantity.append({
-                'product': item.product,
-                'quantity': item.quantity,
-                'subtotal': subtotal
-            })
+        return cart_counter.get_count(request.user)
+    return len(request.cart)
+
+# Cart badge count, fetched by the navbar so storefront pages stay cacheable
+@never_cache
+def cart_summary_view(request):
+    return JsonResponse({'product_count_in_cart': get_cart_badge_count(request)})
+
+class CartSummary:
+    """
+    Lines, total and badge count of the current cart, shared by the cart
+    pages, the navbar badge and the payment processors. Also readable like
+    the dict get_cart_context used to return (summary['total']).
+    """
+
+    def __init__(self, products_with_quantity=None, total=0, product_count_in_cart=0, cart_source='none'):
+        self.products_with_quantity = products_with_quantity or []
+        self.total = total
+        self.product_count_in_cart = product_count_in_cart
+        self.cart_source = cart_source
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
 
+    def as_context(self):
         return {
-            'products_with_quantity': products_with_quantity,
-            'total': total,
-            'product_count_in_cart': cart_items.count(),
-            'cart_source': 'db'
+            'products_with_quantity': self.products_with_quantity,
+            'total': self.total,
+            'product_count_in_cart': self.product_count_in_cart,
+            'cart_source': self.cart_source,
         }
 
-    elif 'product_ids' in request.COOKIES:
-        product_ids = request.COOKIES['product_ids']
-        product_dict = {
-            int(pid): int(count)
-            for pid, count in (pair.split(':') for pair in product_ids.split('|'))
+    def snapshot(self):
+        """
+        JSON copy of the lines and totals, frozen into PaymentSession.cart_data
+        when checkout starts so the later steps don't re-read the cart.
+        """
+        return {
+            'total': self.total,
+            'product_count_in_cart': self.product_count_in_cart,
+            'products': [
+                {
+                    'id': item['product'].id,
+                    'name': item['product'].name,
+                    'description': item['product'].description,
+                    'price': item['product'].price,
+                    'quantity': item['quantity'],
+                    'subtotal': item['subtotal'],
+                }
+                for item in self.products_with_quantity
+            ],
         }
 
-        products = models.Product.objects.filter(id__in=product_dict.keys())
+    @classmethod
+    def for_customer_user(cls, user):
+        # One query: the lines with their products joined in and the
+        # subtotals multiplied out by the database
+        cart_items = (
+            models.Cart.objects.filter(customer__user=user)
+            .select_related('product')
+            .annotate(line_subtotal=F('product__price') * F('quantity'))
+            .order_by('id')
+        )
+        products_with_quantity = [
+            {'product': item.product, 'quantity': item.quantity, 'subtotal': item.line_subtotal}
+            for item in cart_items
+        ]
+        return cls(
+            products_with_quantity,
+            sum(item['subtotal'] for item in products_with_quantity),
+            len(products_with_quantity),
+            'db'
+        )
+
+    @classmethod
+    def for_cookie(cls, cart):
+        products_with_quantity = []
+        products = models.Product.objects.filter(id__in=[pid for pid, _ in cart.items()])
         for p in products:
-            quantity = product_dict.get(p.id, 1)
-            subtotal = p.price * quantity
-            total += subtotal
+            quantity = cart.quantity(p.id)
             products_with_quantity.append({
                 'product': p,
                 'quantity': quantity,
-                'subtotal': subtotal
+                'subtotal': p.price * quantity
             })
 
-        return {
-            'products_with_quantity': products_with_quantity,
-            'total': total,
-            'product_count_in_cart': len(product_dict),
-            'cart_source': 'cookie',
-            'updated_cookie_value': '|'.join(f"{pid}:{count}" for pid, count in product_dict.items())
-        }
+        return cls(
+            products_with_quantity,
+            sum(item['subtotal'] for item in products_with_quantity),
+            len(cart),
+            'cookie'
+        )
 
-    return {
-        'products_with_quantity': [],
-        'total': 0,
-        'product_count_in_cart': 0,
-        'cart_source': 'none'
+
+def get_cart_context(request):
+    if request.user.is_authenticated:
+        return CartSummary.for_customer_user(request.user)
+    elif request.cart:
+        return CartSummary.for_cookie(request.cart)
+    return CartSummary()
+
+
+def product_price_sql(product_id):
+    return Subquery(models.Product.objects.filter(pk=product_id).values('price')[:1])
+
+def add_cart_quantity(customer, product_id):
+    """
+    Add one of a product to a customer's cart line without reading it first.
+    An existing line is bumped with a single UPDATE (quantity and total_price
+    computed in SQL); otherwise the line is inserted. The unique constraint on
+    (customer, product) turns a concurrent insert into an IntegrityError, after
+    which the UPDATE is retried. Returns True if a new line was created.
+    """
+    lines = models.Cart.objects.filter(customer=customer, product_id=product_id)
+    bump = {
+        'quantity': F('quantity') + 1,
+        'total_price': (F('quantity') + 1) * product_price_sql(product_id),
     }
+    if lines.update(**bump):
+        return False
 
+    product = models.Product.objects.get(id=product_id)
+    try:
+        with transaction.atomic():
+            models.Cart.objects.create(customer=customer, product=product, quantity=1, total_price=product.price)
+        return True
+    except IntegrityError:
+        # Another request created the line in the meantime
+        lines.update(**bump)
+        return False
+
+def remove_cart_quantity(customer, product_id):
+    """Take one off a cart line, deleting it at zero. Returns True if the line was deleted."""
+    lines = models.Cart.objects.filter(customer=customer, product_id=product_id)
+    updated = lines.filter(quantity__gt=1).update(
+        quantity=F('quantity') - 1,
+        total_price=(F('quantity') - 1) * product_price_sql(product_id),
+    )
+    if updated:
+        return False
+    deleted, _ = lines.filter(quantity__lte=1).delete()
+    return deleted > 0
 
 # any one can add product to cart, no need of signin
 def add_to_cart_view(request, pk):
@@ -571,135 +775,57 @@ def add_to_cart_view(request, pk):
 
     if request.user.is_authenticated:
         customer = models.Customer.objects.get(user=request.user)
-        product = models.Product.objects.get(id=pk)
-
-        cart_item, created = models.Cart.objects.get_or_create(
-            customer=customer,
-            product=product,
-            defaults={'quantity': 1, 'total_price': product.price}
-        )
-        if not created:
-            cart_item.quantity += 1
-            cart_item.total_price = cart_item.quantity * product.price
-            cart_item.save()
+        if add_cart_quantity(customer, pk):
+            cart_counter.adjust(request.user, 1)
 
     else:
-        if 'product_ids' in request.COOKIES:
-            product_ids = add_product_to_count(request.COOKIES['product_ids'], pk)
-        else:
-            product_ids = f"{pk}:1"
-
-        response = redirect('')  # 👈 Redirect instead of render
-        response.set_cookie('product_ids', product_ids)
-        return response
+        # Guest cart lives in the signed cookie, written back by CartCookieMiddleware
+        request.cart.add(pk)
 
     return redirect('')  # 👈 Redirect instead of render
-
-
-def add_product_to_count(product_ids, new_product_id):
-    print("product_ids:", product_ids)
-
-    # Parse into dictionary
-    product_dict = {
-        int(pid): int(count)
-        for pid, count in (pair.split(':') for pair in product_ids.split('|'))
-    }
-
-    print("Parsed dict:", product_dict)
-
-    # Add or update the new product
-    if new_product_id in product_dict:
-        product_dict[new_product_id] += 1
-    else:
-        product_dict[new_product_id] = 1
-
-    print("Updated dict:", product_dict)
-
-    # Convert back to string format
-    updated_string = '|'.join(f"{pid}:{count}" for pid, count in product_dict.items())
-    print("Updated string:", updated_string)
-
-    return updated_string
         
         
 
 # for checkout of cart
 def cart_view(request):
-    context = get_cart_context(request)
-    response = render(request, 'ecom/cart.html', context)
-
-    # Optional: clear cookie if user is logged in
-    if context['cart_source'] == 'cookie' and request.user.is_authenticated:
-        response.delete_cookie('product_ids')
+    cart = get_cart_context(request)
+    if cart.cart_source == 'db':
+        # The full cart is loaded anyway, correct any drift in the badge counter
+        cart_counter.set_count(request.user, cart.product_count_in_cart)
+        # Optional: clear cookie if user is logged in
+        request.cart.clear()
 
-    return response
+    return render(request, 'ecom/cart.html', cart.as_context())
 
 def remove_from_cart_view(request, pk):
     pk = int(pk)
 
     if request.user.is_authenticated:
         customer = models.Customer.objects.get(user=request.user)
-        models.Cart.objects.filter(customer=customer, product_id=pk).delete()
-
-    elif 'product_ids' in request.COOKIES:
-        product_ids = request.COOKIES['product_ids']
-        product_dict = {
-            int(pid): int(count)
-            for pid, count in (pair.split(':') for pair in product_ids.split('|'))
-        }
-        if pk in product_dict:
-            del product_dict[pk]
-        updated_cookie_value = '|'.join(f"{pid}:{count}" for pid, count in product_dict.items())
+        deleted, _ = models.Cart.objects.filter(customer=customer, product_id=pk).delete()
+        cart_counter.adjust(request.user, -deleted)
+        request.cart.clear()
     else:
-        updated_cookie_value = None
+        request.cart.remove(pk)
 
     # context = get_cart_context(request)
     # response = render(request, 'ecom/cart.html', context)
-    response = redirect('cart')
-
-    if request.user.is_authenticated or not updated_cookie_value:
-        response.delete_cookie('product_ids')
-    elif updated_cookie_value:
-        response.set_cookie('product_ids', updated_cookie_value)
-
-    return response
+    return redirect('cart')
 
 def increment_cart_item_view(request, pk):
     pk = int(pk)
 
     if request.user.is_authenticated:
         customer = models.Customer.objects.get(user=request.user)
-        cart_item, created = models.Cart.objects.get_or_create(
-            customer=customer,
-            product_id=pk,
-            defaults={'quantity': 1, 'total_price': models.Product.objects.get(id=pk).price}
-        )
-        if not created:
-            cart_item.quantity += 1
-            cart_item.total_price = cart_item.quantity * cart_item.product.price
-            cart_item.save()
-
-    elif 'product_ids' in request.COOKIES:
-        product_ids = request.COOKIES['product_ids']
-        product_dict = {
-            int(pid): int(count)
-            for pid, count in (pair.split(':') for pair in product_ids.split('|'))
-        }
-        product_dict[pk] = product_dict.get(pk, 0) + 1
-        updated_cookie_value = '|'.join(f"{pid}:{count}" for pid, count in product_dict.items())
+        if add_cart_quantity(customer, pk):
+            cart_counter.adjust(request.user, 1)
+        request.cart.clear()
     else:
-        updated_cookie_value = f"{pk}:1"
+        request.cart.add(pk)
 
     # context = get_cart_context(request)
     # response = render(request, 'ecom/cart.html', context)
-    response = redirect('cart')
-
-    if request.user.is_authenticated:
-        response.delete_cookie('product_ids')
-    else:
-        response.set_cookie('product_ids', updated_cookie_value)
-
-    return response 
+    return redirect('cart')
 
 
 def decrement_cart_item_view(request, pk):
@@ -707,88 +833,154 @@ def decrement_cart_item_view(request, pk):
 
     if request.user.is_authenticated:
         customer = models.Customer.objects.get(user=request.user)
-        try:
-            cart_item = models.Cart.objects.get(customer=customer, product_id=pk)
-            cart_item.quantity -= 1
-            if cart_item.quantity <= 0:
-                cart_item.delete()
-            else:
-                cart_item.total_price = cart_item.quantity * cart_item.product.price
-                cart_item.save()
-        except models.Cart.DoesNotExist:
-            pass
-
-    elif 'product_ids' in request.COOKIES:
-        product_ids = request.COOKIES['product_ids']
-        product_dict = {
-            int(pid): int(count)
-            for pid, count in (pair.split(':') for pair in product_ids.split('|'))
-        }
-        if pk in product_dict:
-            product_dict[pk] -= 1
-            if product_dict[pk] <= 0:
-                del product_dict[pk]
-        updated_cookie_value = '|'.join(f"{pid}:{count}" for pid, count in product_dict.items())
+        if remove_cart_quantity(customer, pk):
+            cart_counter.adjust(request.user, -1)
+        request.cart.clear()
     else:
-        updated_cookie_value = None
+        request.cart.decrement(pk)
 
     # context = get_cart_context(request)
     # response = render(request, 'ecom/cart.html', context)
-    response = redirect('cart')
-
-    if request.user.is_authenticated or not updated_cookie_value:
-        response.delete_cookie('product_ids')
-    elif updated_cookie_value:
-        response.set_cookie('product_ids', updated_cookie_value)
-
-    return response
+    return redirect('cart')
     
 def clear_cart_view(request):
     if str(request.user) != "AnonymousUser":
         customer = models.Customer.objects.get(user=request.user)
         models.Cart.objects.filter(customer=customer).delete()
-        product_count_in_cart = 0
-        return render(request, 'ecom/cart.html', {
-            'products_with_quantity': [],
-            'total': 0,
-            'product_count_in_cart': product_count_in_cart
-        })
+        cart_counter.set_count(request.user, 0)
+    request.cart.clear()
+
+    return render(request, 'ecom/cart.html', {
+        'products_with_quantity': [],
+        'total': 0,
+        'product_count_in_cart': 0
+    })
+
+
+# JSON cart API used by the cart page buttons: applies one operation
+# (POST cart/api/<op>/<pk>) or a batch (POST cart/api with
+# {"ops": [{"op": "increment", "product": 3}, ...]}) and answers with only the
+# changed lines, the cart total and the badge count instead of a redirect to
+# a re-rendered cart page.
+CART_API_OPS = ('add', 'increment', 'decrement', 'remove')
+CART_API_MAX_OPS = 50
+
+def parse_cart_ops(request, op=None, pk=None):
+    if op is not None:
+        ops = [(op, pk)]
     else:
-        response = render(request, 'ecom/cart.html', {
-            'products_with_quantity': [],
-            'total': 0,
-            'product_count_in_cart': 0
-        })
-        response.delete_cookie('product_ids')
-        return response
+        try:
+            body = json.loads(request.body or b'{}')
+            ops = [(item['op'], int(item['product'])) for item in body.get('ops', [body])]
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+    if not ops or len(ops) > CART_API_MAX_OPS or any(op not in CART_API_OPS for op, _ in ops):
+        return None
+    return ops
+
+def apply_db_cart_ops(request, customer, ops):
+    known = set(models.Product.objects.filter(id__in={pk for _, pk in ops}).values_list('id', flat=True))
+    for op, pk in ops:
+        if pk not in known:
+            continue
+        if op in ('add', 'increment'):
+            add_cart_quantity(customer, pk)
+        elif op == 'decrement':
+            remove_cart_quantity(customer, pk)
+        else:
+            models.Cart.objects.filter(customer=customer, product_id=pk).delete()
+
+    # One query for every line's quantity and subtotal, which also gives the
+    # total and resets the badge counter
+    rows = (
+        models.Cart.objects.filter(customer=customer)
+        .annotate(subtotal=F('product__price') * F('quantity'))
+        .values_list('product_id', 'quantity', 'subtotal')
+    )
+    lines = {pid: (quantity, subtotal) for pid, quantity, subtotal in rows}
+    cart_counter.set_count(request.user, len(lines))
+    return lines, len(lines)
+
+def apply_cookie_cart_ops(request, ops):
+    cart = request.cart
+    prices = dict(
+        models.Product.objects.filter(id__in={pid for pid, _ in cart.items()} | {pk for _, pk in ops})
+        .values_list('id', 'price')
+    )
+    for op, pk in ops:
+        if pk not in prices:
+            continue
+        if op in ('add', 'increment'):
+            cart.add(pk)
+        elif op == 'decrement':
+            cart.decrement(pk)
+        else:
+            cart.remove(pk)
+
+    lines = {pid: (quantity, prices[pid] * quantity) for pid, quantity in cart.items() if pid in prices}
+    return lines, len(cart)
+
+@never_cache
+@require_POST
+def cart_api_view(request, op=None, pk=None):
+    ops = parse_cart_ops(request, op, pk)
+    if ops is None:
+        return JsonResponse({'error': 'Invalid cart operation'}, status=400)
+
+    if request.user.is_authenticated:
+        customer = models.Customer.objects.filter(user=request.user).first()
+        if customer is None:
+            # Admin / staff accounts have no cart
+            return JsonResponse({'error': 'Only customers have a cart'}, status=403)
+        lines, count = apply_db_cart_ops(request, customer, ops)
+    else:
+        lines, count = apply_cookie_cart_ops(request, ops)
+
+    changed = []
+    for pk in dict.fromkeys(pk for _, pk in ops):
+        quantity, subtotal = lines.get(pk, (0, 0))
+        changed.append({'product': pk, 'quantity': quantity, 'subtotal': subtotal})
+    return JsonResponse({
+        'lines': changed,
+        'total': sum(subtotal for _, subtotal in lines.values()),
+        'product_count_in_cart': count,
+    })
     
 def sync_cookie_cart_to_db(request):
-    if 'product_ids' in request.COOKIES and str(request.user) != "AnonymousUser":
-        product_ids = request.COOKIES['product_ids']
-        product_dict = {
-            int(pid): int(count)
-            for pid, count in (pair.split(':') for pair in product_ids.split('|'))
-        }
+    if request.cart and str(request.user) != "AnonymousUser":
+        product_dict = dict(request.cart.items())
 
         customer = models.Customer.objects.get(user=request.user)
 
-        for pid, count in product_dict.items():
-            product = models.Product.objects.get(id=pid)
+        # One query per step instead of three per cookie entry: the products,
+        # the customer's existing lines for them, and a single upsert
+        with transaction.atomic():
+            products = models.Product.objects.in_bulk(product_dict.keys())
+            existing = dict(
+                models.Cart.objects.select_for_update()
+                .filter(customer=customer, product_id__in=products.keys())
+                .values_list('product_id', 'quantity')
+            )
 
-            cart_item, created = models.Cart.objects.get_or_create(
-                customer=customer,
-                product=product,
-                defaults={'quantity': count, 'total_price': product.price * count}
+            lines = []
+            for pid, product in products.items():
+                quantity = max(existing.get(pid, 0), product_dict[pid])  # or += count
+                lines.append(models.Cart(
+                    customer=customer, product=product,
+                    quantity=quantity, total_price=quantity * product.price
+                ))
+
+            # MySQL upserts on any unique key and rejects an explicit conflict target
+            unique_fields = ['customer', 'product'] if connection.features.supports_update_conflicts_with_target else None
+            models.Cart.objects.bulk_create(
+                lines, update_conflicts=True,
+                unique_fields=unique_fields, update_fields=['quantity', 'total_price']
             )
 
-            if not created:
-                cart_item.quantity = max(cart_item.quantity, count)  # or += count
-                cart_item.total_price = cart_item.quantity * product.price
-                cart_item.save()
+        cart_counter.adjust(request.user, len(products) - len(existing))
 
-        response = redirect('cart')  # or wherever you want to land post-login
-        response.delete_cookie('product_ids')
-        return response
+        request.cart.clear()
+        return redirect('cart')  # or wherever you want to land post-login
 
 
 
@@ -798,38 +990,30 @@ def sync_cookie_cart_to_db(request):
 @login_required(login_url='customerlogin')
 @user_passes_test(is_customer , login_url='customerlogin')
 def customer_home_view(request):
-    products_list = models.Product.objects.all().order_by('id')
-
-    # Pagination - 9 products per page
-    paginator = Paginator(products_list, 9)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
+    filters = facets.PriceFilters.from_request(request)
+    products = get_product_grid_page(request, filters)
     
-    if str(request.user) == "AnonymousUser":
-        if 'product_ids' in request.COOKIES:
-            product_ids = request.COOKIES['product_ids']
-            counter=product_ids.split('|')
-            product_count_in_cart=len(set(counter))
-        else:
-            product_count_in_cart=0
-    else:
-        cart_data = get_cart_context(request)
-        product_count_in_cart = cart_data["product_count_in_cart"]
+    product_count_in_cart = get_cart_badge_count(request)
     
-    return render(request,'ecom/customer_home.html',{'products':products,'product_count_in_cart':product_count_in_cart})
+    context = {'products':products,'product_count_in_cart':product_count_in_cart}
+    context.update(get_price_facet_context(filters))
+    return render(request,'ecom/customer_home.html',context)
 
 
 
 # shipment address before placing order
 @login_required(login_url='customerlogin')
 def customer_address_view(request):
-    cart_context = get_cart_context(request)
-    product_in_cart = cart_context['product_count_in_cart'] > 0
+    # The badge counter is enough to know whether there is anything to buy,
+    # the full cart is only read once the address is submitted
+    product_count_in_cart = get_cart_badge_count(request)
+    product_in_cart = product_count_in_cart > 0
 
     addressForm = forms.AddressForm()
     if request.method == 'POST':
         addressForm = forms.AddressForm(request.POST)
         if addressForm.is_valid() and product_in_cart:
+            cart_context = get_cart_context(request)
             email = addressForm.cleaned_data['Email']
             mobile = addressForm.cleaned_data['Mobile']
             address = addressForm.cleaned_data['Address']
@@ -850,7 +1034,7 @@ def customer_address_view(request):
     return render(request, 'ecom/customer_address.html', {
         'addressForm': addressForm,
         'product_in_cart': product_in_cart,
-        'product_count_in_cart': cart_context['product_count_in_cart']
+        'product_count_in_cart': product_count_in_cart
     })
 
 
@@ -866,8 +1050,9 @@ def payment_success_view(request):
         except models.Customer.DoesNotExist:
             pass
 
-    cart_context = get_cart_context(request)
-    products_with_quantity = cart_context['products_with_quantity']
+    # Order exactly what was paid for: the cart as frozen when the payment
+    # session was created, not whatever the cart holds now
+    products_with_quantity = request.payment_session.cart_data.get('products', [])
 
     email = request.COOKIES.get('email')
     mobile = request.COOKIES.get('mobile')
@@ -882,29 +1067,40 @@ def payment_success_view(request):
         return render(request, 'ecom/payment_failed.html')
 
     try:
+        # Two statements whatever the cart size: one INSERT for all the order
+        # rows and one DELETE of the ordered cart lines, so the transaction
+        # holds its locks only briefly
         with transaction.atomic():
-            for item in products_with_quantity:
-                product = item['product']
-                quantity = item['quantity']
-
-                models.Orders.objects.create(
+            orders = models.Orders.objects.bulk_create([
+                models.Orders(
                     customer=customer,
-                    product=product,
+                    product_id=item['id'],
                     status='Pending',
                     email=email,
                     mobile=mobile,
                     address=address,
                     order_id=order_id,
                     transaction_id=transaction_id,
-                    quantity=quantity
+                    quantity=item['quantity']
                 )
-
-                models.Cart.objects.filter(customer=customer, product=product).delete()
-
-        # Log payment transaction after all orders succeed
-        PaymentTransactionManager.update_payment_transaction(
-            request.COOKIES, request.GET, request.user.id, order_id
-        )
+                for item in products_with_quantity
+            ])
+            # bulk_create sends no post_save, count the new orders and render
+            # the invoice here
+            transaction.on_commit(lambda: dashboard_stats.adjust('orders', len(orders)))
+            if orders:
+                transaction.on_commit(lambda: invoices.schedule_for(customer.id, order_id))
+
+            if customer is not None:
+                deleted, _ = models.Cart.objects.filter(
+                    customer=customer, product_id__in=[item['id'] for item in products_with_quantity]
+                ).delete()
+                transaction.on_commit(lambda: cart_counter.adjust(request.user, -deleted))
+
+            # Log payment transaction once the orders are committed
+            transaction.on_commit(lambda: PaymentTransactionManager.update_payment_transaction(
+                request.COOKIES, request.GET, request.user.id, order_id, request
+            ))
 
     except Exception as e:
         error_message = ErrorMessageManager.getErrorMessage(1002)  # order creation failed
@@ -913,8 +1109,8 @@ def payment_success_view(request):
         return render(request, 'ecom/payment_failed.html')
 
     # If everything succeeds → show success page
+    request.cart.clear()
     res = render(request, 'ecom/payment_success.html')
-    res.delete_cookie('product_ids')
     res.delete_cookie('email')
     res.delete_cookie('mobile')
     res.delete_cookie('address')
@@ -992,28 +1188,14 @@ class PaymentTransactionManager:
 @login_required(login_url='customerlogin')
 @user_passes_test(is_customer , login_url='customerlogin')
 def my_order_view(request):
-    customer=models.Customer.objects.get(user_id=request.user.id)
-    orders=models.Orders.objects.all().filter(customer_id = customer)
-    ordered_products=[]
-    for order in orders:
-        ordered_product=models.Product.objects.all().filter(id=order.product.id)
-        ordered_products.append(ordered_product)
-        
-    # Pagination - 9 orders per page
-    paginator = Paginator(list(zip(ordered_products, orders))[::-1], 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    orders = models.Orders.objects.filter(customer__user_id=request.user.id).select_related('product')
+
+    # Keyset pagination - 5 orders per page, newest first (?after=<id> / ?before=<id>),
+    # one query per page with the products joined in
+    paginator = KeysetPaginator(orders, 5, order_by='-pk')
+    page_obj = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
-    if str(request.user) == "AnonymousUser":
-        if 'product_ids' in request.COOKIES:
-            product_ids = request.COOKIES['product_ids']
-            counter=product_ids.split('|')
-            product_count_in_cart=len(set(counter))
-        else:
-            product_count_in_cart=0
-    else:
-        cart_data = get_cart_context(request)
-        product_count_in_cart = cart_data["product_count_in_cart"]
+    product_count_in_cart = get_cart_badge_count(request)
 
     return render(request,'ecom/my_order.html',{'data':page_obj , 'product_count_in_cart' : product_count_in_cart})
 
@@ -1021,42 +1203,30 @@ def my_order_view(request):
 
 
 #--------------for bill (pdf) download and printing
-import io
-from xhtml2pdf import pisa
-from django.template.loader import get_template
-from django.http import HttpResponse
-
-
-def render_to_pdf(template_src, context_dict):
-    template = get_template(template_src)
-    html  = template.render(context_dict)
-    result = io.BytesIO()
-    pdf = pisa.pisaDocument(io.BytesIO(html.encode("ISO-8859-1")), result)
-    if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
-    return
-
+# One invoice per order_id, rendered ahead of time by ecom.invoices and
+# served from disk with the content digest as ETag
 @login_required(login_url='customerlogin')
 @user_passes_test(is_customer , login_url='customerlogin')
-def download_invoice_view(request,orderID,productID):
-    order=models.Orders.objects.get(id=orderID)
-    product=models.Product.objects.get(id=productID)
-    mydict={
-        'orderDate':order.order_date,
-        'customerName':request.user,
-        'customerEmail':order.email,
-        'customerMobile':order.mobile,
-        'shipmentAddress':order.address,
-        'orderStatus':order.status,
-
-        'productName':product.name,
-        'productImage':product.product_image,
-        'productPrice':product.price,
-        'productDescription':product.description,
-
-
-    }
-    return render_to_pdf('ecom/download_invoice.html',mydict)
+def download_invoice_view(request,orderID,productID=None):
+    order = get_object_or_404(models.Orders, id=orderID, customer__user=request.user)
+    lines = invoices.invoice_lines(order)
+    # Only renders here if the background job hasn't got to it yet
+    path, digest = invoices.ensure_invoice(lines)
+
+    if f'"{digest}"' in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            pdf = open(path, 'rb')
+        except FileNotFoundError:
+            # The order changed meanwhile and this version was replaced
+            path, digest = invoices.ensure_invoice(invoices.invoice_lines(order))
+            pdf = open(path, 'rb')
+        response = FileResponse(pdf, content_type='application/pdf',
+                                filename=f'invoice-{order.order_id or order.pk}.pdf')
+    response['ETag'] = f'"{digest}"'
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 
@@ -1068,16 +1238,7 @@ def download_invoice_view(request,orderID,productID):
 def my_profile_view(request):
     customer=models.Customer.objects.get(user_id=request.user.id)
     
-    if str(request.user) == "AnonymousUser":
-        if 'product_ids' in request.COOKIES:
-            product_ids = request.COOKIES['product_ids']
-            counter=product_ids.split('|')
-            product_count_in_cart=len(set(counter))
-        else:
-            product_count_in_cart=0
-    else:
-        cart_data = get_cart_context(request)
-        product_count_in_cart = cart_data["product_count_in_cart"]
+    product_count_in_cart = get_cart_badge_count(request)
     
     return render(request,'ecom/my_profile.html',{'customer':customer , 'product_count_in_cart' : product_count_in_cart})
 
@@ -1108,15 +1269,18 @@ class PaymentProcessor:
 
     def __init__(self, request):
         self.request = request
+        # The cart is read once here; the snapshot goes into the payment
+        # session and everything after (line items, orders) works from it
+        self.cart = get_cart_context(request)
+        self.cart_data = self.cart.snapshot()
         self.amount_data = self.calculate_checkout_price()
-        self.amount = self.amount_data["total"]
-        self.products_with_quantity = self.amount_data["products_with_quantity"]
+        self.amount = self.cart_data['total']
+        self.products_with_quantity = self.cart.products_with_quantity
 
     def calculate_checkout_price(self):
-        cart_context = get_cart_context(self.request)
         return {
-            'total': cart_context['total'],
-            'products_with_quantity': cart_context['products_with_quantity']
+            'total': self.cart_data['total'],
+            'products_with_quantity': self.cart.products_with_quantity
         }
 
 
@@ -1232,7 +1396,7 @@ class StripePaymentProcessor(PaymentProcessor):
                 user_id=self.request.user.id if self.request.user.is_authenticated else None,
                 customer_email=customer_data['email'],
                 amount=float(self.amount),
-                cart_data={'products': [{'id': item['product'].id, 'quantity': item['quantity']} for item in self.products_with_quantity]},
+                cart_data=self.cart_data,
                 shipping_details=customer_data
             )
             payment_session.status = 'INITIATED'
@@ -1266,19 +1430,17 @@ class StripePaymentProcessor(PaymentProcessor):
         # products_with_quantity = models.Cart.objects.filter(customer_id = request.user)
         
         line_items = []
-        for item in self.products_with_quantity:
-            product = item['product']
-            quantity = item['quantity']
+        for item in self.cart_data['products']:
             line_items.append({
                 'price_data': {
                     'currency': 'inr',
-                    'unit_amount': product.price * 100,
+                    'unit_amount': item['price'] * 100,
                     'product_data': {
-                        'name': product.name,
-                        'description': product.description,
+                        'name': item['name'],
+                        'description': item['description'],
                     },
                 },
-                'quantity': quantity,
+                'quantity': item['quantity'],
             })
         return line_items
 
@@ -1335,7 +1497,7 @@ class PhonepePaymentProcessor(PaymentProcessor):
                 user_id=self.request.user.id if self.request.user.is_authenticated else None,
                 customer_email=customer_data['email'],
                 amount=float(self.amount),
-                cart_data={'products': [{'id': item['product'].id, 'quantity': item['quantity']} for item in self.products_with_quantity]},
+                cart_data=self.cart_data,
                 shipping_details=customer_data
             )
             payment_session.status = 'INITIATED'
@@ -1427,7 +1589,7 @@ class GooglePayPaymentProcessor(PaymentProcessor):
                 user_id=self.request.user.id if self.request.user.is_authenticated else None,
                 customer_email=customer_data['email'],
                 amount=float(self.amount),
-                cart_data={'products': [{'id': item['product'].id, 'quantity': item['quantity']} for item in self.products_with_quantity]},
+                cart_data=self.cart_data,
                 shipping_details=customer_data
             )
             payment_session.status = 'INITIATED'
@@ -2336,6 +2498,103 @@ class ChatbotAPIView(APIView):
 
 
 
+### -------     Catalog API     ---------
+
+from rest_framework.permissions import AllowAny
+from django.utils.decorators import method_decorator
+
+
+# Fields a client can ask for with ?fields=, mapped to the columns they are read from
+PRODUCT_API_FIELDS = {
+    'id': ('id',),
+    'name': ('name',),
+    'price': ('price',),
+    'description': ('description',),
+    'image': ('product_image', 'image_variants'),
+    'thumbnail': ('product_image', 'image_variants'),
+}
+PRODUCT_API_PAGE_SIZE = 50
+PRODUCT_API_MAX_PAGE_SIZE = 200
+
+
+def product_api_etag(request, *args, **kwargs):
+    # Responses only change with the catalog, whoever asks for them
+    version = catalog_cache.get_catalog_version()
+    return hashlib.md5(f"api:{version}:{request.get_full_path()}".encode('utf-8')).hexdigest()
+
+
+def serialize_product_row(row, fields):
+    item = {}
+    for field in fields:
+        if field == 'image':
+            item['image'] = models.Product.image_url_from_values(row['product_image'], row['image_variants'])
+        elif field == 'thumbnail':
+            item['thumbnail'] = models.Product.image_variant_url_from_values(row['product_image'], row['image_variants'], 300)
+        else:
+            item[field] = row[field]
+    return item
+
+
+class ProductListAPIView(APIView):
+    """
+    GET /api/products/?fields=id,name,price&cursor=<last id>&page_size=50
+
+    Read-only product list in id order. Rows are read with .values() and
+    turned straight into dicts, no Product objects are built. Pages are
+    cached under the catalog version and answer If-None-Match with a 304.
+    """
+    # Public catalog data, skip the session / user lookups
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @method_decorator(condition(etag_func=product_api_etag))
+    def get(self, request, *args, **kwargs):
+        requested = request.GET.get('fields')
+        fields = [f.strip() for f in requested.split(',') if f.strip()] if requested else list(PRODUCT_API_FIELDS)
+        unknown = [f for f in fields if f not in PRODUCT_API_FIELDS]
+        if unknown:
+            return Response(
+                {"error": f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(PRODUCT_API_FIELDS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            page_size = min(max(int(request.GET.get('page_size', PRODUCT_API_PAGE_SIZE)), 1), PRODUCT_API_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = PRODUCT_API_PAGE_SIZE
+        cursor = parse_cursor(request.GET.get('cursor'))
+        filters = facets.PriceFilters.from_request(request)
+
+        def build():
+            columns = {'id'}
+            for field in fields:
+                columns.update(PRODUCT_API_FIELDS[field])
+
+            rows = models.Product.objects.filter(search.price_filter(filters.price_range))
+            if cursor is not None:
+                rows = rows.filter(id__gt=cursor)
+            # One extra row tells us whether there is a next page
+            rows = list(rows.order_by('id').values(*columns)[:page_size + 1])
+
+            next_cursor = rows[page_size - 1]['id'] if len(rows) > page_size else None
+            return {
+                'results': [serialize_product_row(row, fields) for row in rows[:page_size]],
+                'next_cursor': next_cursor,
+            }
+
+        data = catalog_cache.get_or_set('api_products', [fields, cursor, page_size] + filters.cache_parts(), build)
+
+        next_url = None
+        if data['next_cursor'] is not None:
+            params = request.GET.copy()
+            params['cursor'] = data['next_cursor']
+            next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+        response = Response({'results': data['results'], 'next': next_url})
+        patch_cache_control(response, public=True, max_age=settings.STOREFRONT_CACHE_MAX_AGE)
+        return response
+
+
 ### -------     Implementation Testing     ---------
 
 from .ResumeParser.resume_analyzer import ResumeAnalyzer
@@ -62,12 +62,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ecom.middleware.SharedCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ecom.middleware.CartCookieMiddleware',
 
 ]
 
@@ -114,10 +116,80 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            # Wait for a concurrent writer instead of failing with "database is locked"
+            'OPTIONS': {'timeout': 20},
+            # On-disk test database: the default in-memory one uses shared-cache
+            # table locks that fail immediately, which breaks the concurrency tests
+            'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
         }
     }
 
 
+# Cache
+# Default: in-process memory, override with env vars for Redis/Memcached
+# e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#      CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    # Server-side guest carts (GUEST_CART_STORE = 'cache'), point this at
+    # Redis in production so carts survive restarts and are shared by workers
+    'guest_carts': {
+        'BACKEND': os.getenv('GUEST_CART_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('GUEST_CART_CACHE_LOCATION', 'guest-carts'),
+    },
+}
+
+# Product-grid / search result cache entries are invalidated by bumping the
+# catalog version. The version lives in the default cache, so with several
+# worker processes that cache must be shared (Redis/Memcached): with the
+# per-process LocMemCache a bump only reaches the worker that made it, and
+# the others keep their pages until this timeout (None = until evicted)
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300)) or None
+
+# Guest cart cookie limits (ecom/cart_cookie.py), keep the cookie well under
+# the ~4KB browsers allow per cookie
+CART_COOKIE_MAX_BYTES = 2048
+CART_COOKIE_MAX_LINES = 50
+CART_COOKIE_MAX_QUANTITY = 99
+CART_COOKIE_AGE = 60 * 60 * 24 * 30
+
+# Where guest carts are kept (ecom/guest_cart.py): 'cookie' = the signed cookie
+# above, 'cache' = lines in the guest_carts cache, the cookie only holds an
+# opaque cart id. Cache entries expire GUEST_CART_TTL seconds after the last change.
+GUEST_CART_STORE = os.getenv('GUEST_CART_STORE', 'cookie')
+GUEST_CART_TTL = 60 * 60 * 24 * 30
+GUEST_CART_MAX_LINES = 500
+
+# Cached cart line count per customer for the navbar badge (ecom/cart_counter.py),
+# re-counted from the Cart table when it expires
+CART_COUNT_TIMEOUT = 60 * 60 * 24
+
+# Cached customer / product / order totals for the admin dashboard
+# (ecom/dashboard_stats.py), re-counted from the tables when they expire.
+# Also bounds how long a change made while a counter was being re-counted
+# (and so not applied to it) stays missing from the dashboard.
+DASHBOARD_STATS_TIMEOUT = 60 * 60
+
+# Rows fetched per database round trip by the streaming CSV / JSONL exports (ecom/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Product search tops up results with similarly spelled names (ecom/trigram.py)
+# when the full-text search finds fewer than SEARCH_FUZZY_MIN_HITS products
+SEARCH_FUZZY_MIN_HITS = 3
+SEARCH_FUZZY_THRESHOLD = 0.3
+SEARCH_FUZZY_LIMIT = 27
+
+# Price ranges offered as facets on the product grid and search results,
+# (min, max) with max exclusive, None = no upper bound
+PRICE_FACET_BUCKETS = [(0, 500), (500, 1000), (1000, 5000), (5000, 10000), (10000, None)]
+
+# max-age (seconds) for anonymous storefront pages in browsers / proxies
+STOREFRONT_CACHE_MAX_AGE = int(os.getenv('STOREFRONT_CACHE_MAX_AGE', 600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -162,6 +234,24 @@ STATICFILES_DIRS=[STATIC_DIR,]
 MEDIA_URL = '/media/'
 MEDIA_ROOT=os.path.join(BASE_DIR,'static')
 
+# Product image derivatives (see ecom/images.py): widths generated for every
+# uploaded product image, each as the original format and as WebP
+PRODUCT_IMAGE_WIDTHS = (80, 300, 600)
+PRODUCT_IMAGE_QUALITY = 80
+PRODUCT_IMAGE_WORKERS = int(os.getenv('PRODUCT_IMAGE_WORKERS', 2))
+# Resize on a background thread after the save commits (False = inline, used by tests)
+PRODUCT_IMAGE_ASYNC = True
+# External product image URLs are downloaded once and served locally
+REMOTE_IMAGE_TIMEOUT = 10
+REMOTE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+# Invoice PDFs (ecom/invoices.py), kept outside MEDIA_ROOT since they are
+# only served to their customer through the download view
+INVOICE_ROOT = os.path.join(BASE_DIR, 'invoices')
+INVOICE_WORKERS = int(os.getenv('INVOICE_WORKERS', 2))
+# Render on a background thread after commit (False = inline, used by tests)
+INVOICE_ASYNC = True
+
 
 
 LOGIN_REDIRECT_URL='/afterlogin'
@@ -14,6 +14,7 @@ urlpatterns = [
     path('afterlogin', views.afterlogin_view,name='afterlogin'),
     path('logout', LogoutView.as_view(template_name='ecom/logout.html'),name='logout'),
     path('search', views.search_view,name='search'),
+    path('search/suggest', views.search_suggest_view,name='search-suggest'),
 
     path('adminclick', views.adminclick_view),
     path('adminlogin', LoginView.as_view(template_name='ecom/adminlogin.html'),name='adminlogin'),
@@ -32,6 +33,8 @@ urlpatterns = [
     path('delete-order/<int:pk>', views.delete_order_view,name='delete-order'),
     path('update-order/<int:pk>', views.update_order_view,name='update-order'),
     
+    path('admin-sales', views.admin_sales_view,name='admin-sales'),
+    path('admin-export/<str:kind>', views.admin_export_view,name='admin-export'),
     path('admin-logs' , views.admin_logs_view , name="admin-logs"),
     path('admin-payment-logs' , views.admin_payment_logs_view , name="admin-payment-logs"),
     path('admin-stripe-logs' , views.admin_stripe_logs_view , name="admin-stripe-logs"),
@@ -46,13 +49,17 @@ urlpatterns = [
     path('my-order', views.my_order_view,name='my-order'),
     path('my-profile', views.my_profile_view,name='my-profile'),
     path('edit-profile', views.edit_profile_view,name='edit-profile'),
-    path('download-invoice/<int:orderID>/<int:productID>', views.download_invoice_view,name='download-invoice'),
+    path('download-invoice/<int:orderID>', views.download_invoice_view,name='download-invoice'),
+    path('download-invoice/<int:orderID>/<int:productID>', views.download_invoice_view,name='download-invoice-line'),
 
 
     path('add-to-cart/<int:pk>', views.add_to_cart_view,name='add-to-cart'),
     path('decrement-cart-item-view/<int:pk>', views.decrement_cart_item_view,name='decrement-cart-item-view'),
     path('increment-cart-item-view/<int:pk>', views.increment_cart_item_view,name='increment-cart-item-view'),
     path('cart', views.cart_view,name='cart'),
+    path('cart-summary', views.cart_summary_view,name='cart-summary'),
+    path('cart/api', views.cart_api_view,name='cart-api'),
+    path('cart/api/<str:op>/<int:pk>', views.cart_api_view,name='cart-api-op'),
     path('remove-from-cart/<int:pk>', views.remove_from_cart_view,name='remove-from-cart'),
     path('customer-address', views.customer_address_view,name='customer-address'),
     path('payment-success', views.payment_success_view,name='payment-success'),
@@ -75,6 +82,7 @@ urlpatterns = [
     # path("analyse-pdfs/" , views.analyse_resumes , name="analyse-pdfs"),
     path("analyse-batch/" , views.analyse_batch , name="analyse-batch"),
     path('api/chat/', views.ChatbotAPIView.as_view(), name='chatbot_api'),
+    path('api/products/', views.ProductListAPIView.as_view(), name='product_api'),
     
 
 